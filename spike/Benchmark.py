@@ -0,0 +1,170 @@
+import re
+from contextlib import redirect_stdout
+from os import devnull, path
+from pickle import load
+from platform import python_version
+from random import Random
+from subprocess import run, DEVNULL
+from tempfile import TemporaryDirectory
+from time import perf_counter, time
+
+from .similarity import compare, rank
+from .util import summarize
+from .SciQA import SciQA, DATA_PATH, URL
+from .OrkgContext import OrkgContext, N_EXAMPLES
+from .Responder import Responder, extract_query
+from .NTriplesLoader import NTriplesLoader
+from .LabelIndex import LabelIndex
+
+
+FIXTURE_PATH = path.join('assets', 'bench', 'orkg.nt')
+ANSWERS_PATH = path.join('assets', 'queries.pkl')
+
+BENCHMARKS = ('compare', 'rank', 'cut', 'get_triples', 'ask')
+
+QUESTION = re.compile(r'answer the question "(.*)"\.\n')  # see PROMPT in Responder
+
+
+def measure(function: callable, items: list, repeat: int = 1):
+    """
+    Call function for each item repeat times and return list of durations of the calls
+    """
+
+    durations = []
+
+    for _ in range(repeat):
+        for item in items:
+            start = perf_counter()
+            function(item)
+            durations.append(perf_counter() - start)
+
+    return durations
+
+
+def _revision():
+    try:
+        return run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, stdin = DEVNULL, check = True).stdout.strip()
+    except Exception:  # not a git checkout or no git
+        return None
+
+
+class ReplayClient:
+    """
+    Stand-in for ChatClient which answers prompts with completions recorded in the pickled cache of answers, so that no requests are sent to the llm
+    """
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.n_requests = 0
+
+    def complete(self, content: str):
+        if (match := QUESTION.search(content)) is None or (answer := self.answers.get(match.group(1))) is None:
+            raise KeyError('No recorded answer for the prompt')
+
+        self.n_requests += 1
+
+        return answer
+
+
+class Benchmark:
+    """
+    Times hot paths of the question answering on local data: edit distance similarity and ranking of few-shot examples over the SciQA train split,
+    cutting the context, execution of recorded queries against a small n-triples graph and answering questions end to end with recorded llm completions
+    """
+
+    def __init__(self, graph_path: str = FIXTURE_PATH, answers_path: str = ANSWERS_PATH, n_questions: int = 100, repeat: int = 1, seed: int = 0):
+        self.graph_path = graph_path
+        self.answers_path = answers_path
+        self.repeat = repeat
+        self.seed = seed
+
+        with open(answers_path, 'rb') as file:
+            self.answers = load(file)
+
+        self.questions = Random(seed).sample(sorted(self.answers), min(n_questions, len(self.answers)))
+
+        if not path.isdir(DATA_PATH):  # otherwise SciQA would download it
+            raise FileNotFoundError(
+                f'SciQA dataset is not found in {DATA_PATH}, the benchmark doesn\'t access the network, so extract {URL} there first (ask does it on the first run)'
+            )
+
+        self.setup = {}
+
+        self.train = self._timed('sciqa', lambda: SciQA().train)
+        self.graph = self._timed('graph', lambda: NTriplesLoader(workers = 1, progress = False).load(graph_path))
+
+        self._tmp = TemporaryDirectory()
+        self.context_path = path.join(self._tmp.name, 'orkg-context.pkl')
+
+        with open(devnull, 'w') as file, redirect_stdout(file):
+            self.context = self._timed('context', lambda: OrkgContext(self.context_path, fresh = True, graph = self.graph, labels = LabelIndex(self.graph)))
+
+    def _timed(self, name: str, function: callable):
+        start = perf_counter()
+        result = function()
+        self.setup[name] = perf_counter() - start
+
+        return result
+
+    def compare(self):
+        random = Random(self.seed)
+        utterances = self.train.utterances
+
+        pairs = [(question, random.choice(utterances)) for question in self.questions for _ in range(10)]
+
+        return measure(lambda pair: compare(*pair), pairs, self.repeat)
+
+    def rank(self):
+        train = self.train
+
+        return measure(
+            lambda question: rank(question, train.entries, top_n = N_EXAMPLES, get_utterance = lambda entry: entry.utterance, index = train.index),
+            self.questions, self.repeat
+        )
+
+    def cut(self):
+        examples = [None] * N_EXAMPLES  # ranking is measured separately
+
+        return measure(lambda question: self.context.cut(question, examples = examples), self.questions, self.repeat)
+
+    def get_triples(self):
+        queries = [extract_query(self.answers[question]) for question in self.questions]
+
+        return measure(self.context.get_triples, queries, self.repeat)
+
+    def ask(self):
+        durations = []
+
+        for _ in range(self.repeat):  # every round starts with empty caches
+            responder = Responder(
+                None, None, graph = self.graph, graph_id = 'bench', client = ReplayClient(self.answers), context_path = self.context_path
+            )
+            durations.extend(measure(responder.ask, self.questions))
+
+        return durations
+
+    def run(self, names: [str] = BENCHMARKS):
+        results = {}
+
+        with open(devnull, 'w') as file, redirect_stdout(file):  # results of the queries are printed by the responder
+            for name in names:
+                results[name] = summarize(getattr(self, name)())
+
+        return {
+            'meta': {
+                'revision': _revision(),
+                'python': python_version(),
+                'timestamp': time(),
+                'graph': self.graph_path,
+                'n_triples': len(self.graph),
+                'n_questions': len(self.questions),
+                'repeat': self.repeat,
+                'seed': self.seed,
+                'unit': 's'
+            },
+            'setup': self.setup,
+            'results': results
+        }
+
+    def close(self):
+        self._tmp.cleanup()
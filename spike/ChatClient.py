@@ -0,0 +1,144 @@
+from concurrent.futures import ThreadPoolExecutor
+from random import uniform
+from threading import BoundedSemaphore, Condition
+from time import monotonic, sleep
+
+from openai import ChatCompletion as cc
+from openai.error import APIConnectionError, APIError, RateLimitError, ServiceUnavailableError, Timeout
+
+
+MODEL = 'gpt-3.5-turbo'
+
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 90000
+
+CHARS_PER_TOKEN = 4  # rough estimate which is used to reserve tokens before the actual usage is known
+COMPLETION_TOKENS = 512  # expected number of tokens in a completion
+
+
+class TokenBucket:
+    """
+    Allows to spend at most rate units per minute, with bursts of at most capacity units
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate / 60
+        self.capacity = rate if capacity is None else capacity
+
+        self.tokens = self.capacity
+        self.updated = monotonic()
+
+        self._condition = Condition()
+
+    def _refill(self):
+        now = monotonic()
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)  # requests which are larger than the bucket would wait forever otherwise
+
+        with self._condition:
+            while True:
+                self._refill()
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                self._condition.wait((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """
+        Return (if amount is positive) or take (otherwise) tokens after the real cost of an operation is known
+        """
+
+        with self._condition:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+            self._condition.notify_all()
+
+
+class ChatClient:
+    """
+    Client for the chat completion api which keeps request and token rates below the given limits and retries throttled and failed requests
+    """
+
+    def __init__(
+        self, model: str = MODEL, requests_per_minute: float = REQUESTS_PER_MINUTE, tokens_per_minute: float = TOKENS_PER_MINUTE, max_concurrency: int = 4,
+        max_retries: int = 6, backoff: float = 1.0, max_backoff: float = 60.0, api_base: str = None
+    ):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.api_base = api_base
+
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+        self._slots = BoundedSemaphore(max_concurrency)
+
+    def _delay(self, attempt: int, error: Exception):
+        headers = getattr(error, 'headers', None) or {}
+
+        if (retry_after := headers.get('retry-after', headers.get('Retry-After'))) is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _retryable(error: Exception):
+        if isinstance(error, (RateLimitError, ServiceUnavailableError, APIConnectionError, Timeout)):
+            return True
+
+        return isinstance(error, APIError) and (error.http_status is None or error.http_status >= 500)
+
+    def complete(self, content: str):
+        estimate = len(content) / CHARS_PER_TOKEN + COMPLETION_TOKENS
+
+        attempt = 0
+
+        while True:
+            self.requests.acquire()
+            self.tokens.acquire(estimate)
+
+            try:
+                with self._slots:
+                    completion = cc.create(
+                        model = self.model,
+                        messages = [
+                            {
+                                'role': 'user',
+                                'content': content
+                            }
+                        ],
+                        api_base = self.api_base
+                    )
+            except Exception as e:
+                self.tokens.adjust(estimate)  # nothing has been spent by the failed attempt
+
+                if not self._retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                sleep(self._delay(attempt, e))
+                attempt += 1
+                continue
+
+            if (usage := completion.get('usage')) is not None:
+                self.tokens.adjust(estimate - usage['total_tokens'])
+
+            return completion.choices[0].message.content
+
+    def complete_many(self, contents: [str]):
+        """
+        Complete many prompts with up to max_concurrency requests in flight, results are returned in the same order as prompts
+        """
+
+        with ThreadPoolExecutor(max_workers = self.max_concurrency) as executor:
+            return list(executor.map(self.complete, contents))
@@ -0,0 +1,77 @@
+from json import dumps, loads, JSONDecodeError
+from os import path
+from threading import Lock
+
+
+class Checkpoint:
+    """
+    Append-only jsonl file with results which have already been computed, a partially written last line (after a crash) is ignored.
+
+    A record may carry an error, which marks results of a computation that failed permanently, so that it is not repeated
+    """
+
+    def __init__(self, checkpoint_path: str):
+        self.path = checkpoint_path
+        self.records = {}
+        self.errors = {}
+
+        terminated = True
+
+        if path.isfile(checkpoint_path):
+            with open(checkpoint_path, 'r', encoding = 'utf-8') as file:
+                for line in file:
+                    terminated = line.endswith('\n')
+
+                    try:
+                        record = loads(line)
+                    except JSONDecodeError:
+                        continue
+
+                    self.records[record['key']] = record['value']
+
+                    if (error := record.get('error')) is not None:
+                        self.errors[record['key']] = error
+                    else:
+                        self.errors.pop(record['key'], None)
+
+        self._terminated = terminated
+        self._lock = Lock()
+        self._file = None
+
+    def __contains__(self, key: str):
+        return key in self.records
+
+    def get(self, key: str, default = None):
+        return self.records.get(key, default)
+
+    def add(self, key: str, value, error: str = None):
+        line = dumps({'key': key, 'value': value} if error is None else {'key': key, 'value': value, 'error': error}, ensure_ascii = False)
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding = 'utf-8')
+
+                if not self._terminated:
+                    self._file.write('\n')  # make sure that a partially written line is terminated
+
+            self._file.write(line + '\n')
+            self._file.flush()
+
+            self.records[key] = value
+
+            if error is not None:
+                self.errors[key] = error
+            else:
+                self.errors.pop(key, None)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
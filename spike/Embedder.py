@@ -0,0 +1,123 @@
+from transformers import AutoTokenizer, FalconModel
+from torch import inference_mode, set_num_threads, set_num_interop_threads
+
+from .EmbeddingCache import EmbeddingCache
+
+
+MODEL = 'Rocketknight1/falcon-rw-1b'
+
+MAX_BATCH_TOKENS = 4096  # max number of tokens in a padded batch
+MAX_BATCH_SIZE = 64  # max number of texts in a batch
+
+
+class Embedder:
+    """
+    Computes mean of the last hidden states of the model over tokens of each text.
+
+    Texts are sorted by number of tokens and split into batches which fit the token budget, so that short texts are not padded to the length of the long ones,
+    and computed embeddings are optionally kept in the cache, so that only texts which haven't been seen before are passed to the model
+    """
+
+    def __init__(
+        self, model: str = MODEL, device: str = 'cpu', cache_path: str = None, max_batch_tokens: int = MAX_BATCH_TOKENS, max_batch_size: int = MAX_BATCH_SIZE,
+        threads: int = None, interop_threads: int = None
+    ):
+        self.name = model
+        self.device = device
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+
+        if threads is not None:
+            set_num_threads(threads)
+
+        if interop_threads is not None:
+            try:
+                set_num_interop_threads(interop_threads)
+            except RuntimeError:  # can be set only once, before any parallel work has been started
+                print(f'Cannot set number of interop threads to {interop_threads}')
+
+        self.tokenizer = tokenizer = AutoTokenizer.from_pretrained(model, device_map = device)
+        tokenizer.pad_token = tokenizer.eos_token
+
+        self.model = FalconModel.from_pretrained(model, device_map = device)
+        self.model.eval()
+
+        self.cache = None if cache_path is None else EmbeddingCache(cache_path, model)
+
+        self.n_embedded = 0
+        self.n_cached = 0
+
+    def _to_device(self, outputs: dict):
+        return {
+            'input_ids': outputs['input_ids'].to(self.device),
+            'attention_mask': outputs['attention_mask'].to(self.device)
+        }
+
+    def _batches(self, input_ids: [list]):
+        """
+        Yield lists of indices of texts ordered by number of tokens, such that the size of each padded batch doesn't exceed the budget
+        """
+
+        batch = []
+
+        for i in sorted(range(len(input_ids)), key = lambda i: len(input_ids[i])):
+            if batch and ((len(batch) + 1) * len(input_ids[i]) > self.max_batch_tokens or len(batch) >= self.max_batch_size):
+                yield batch
+                batch = []
+
+            batch.append(i)
+
+        if batch:
+            yield batch
+
+    @inference_mode()
+    def _embed(self, texts: [str]):
+        input_ids = self.tokenizer(texts)['input_ids']
+        embeddings = [None] * len(texts)
+
+        for batch in self._batches(input_ids):
+            inputs = self._to_device(
+                self.tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors = 'pt')
+            )
+            outputs = self.model(**inputs)
+
+            mask = inputs['attention_mask'].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+
+            for i, embedding in zip(batch, ((outputs.last_hidden_state * mask).sum(dim = 1) / mask.sum(dim = 1)).to('cpu').tolist()):
+                embeddings[i] = embedding
+
+        self.n_embedded += len(texts)
+
+        return embeddings
+
+    def embed_one(self, text: str):
+        return self.embed([text])[0]
+
+    def embed(self, texts: [str]):
+        """
+        Embed a list of texts, padding tokens are excluded from averaging so that results don't depend on how texts are split into batches
+        """
+
+        if self.cache is None:
+            return self._embed(texts)
+
+        keys = [self.cache.key(text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}  # the same text may occur many times in the list
+
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing[key] = text
+
+        if missing:
+            computed = dict(zip(missing, self._embed(list(missing.values()))))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        self.n_cached += len(texts) - len(missing)
+
+        return [found[key] for key in keys]
+
+    def report(self):
+        return f'{self.n_embedded} texts embedded, {self.n_cached} taken from the cache'
@@ -0,0 +1,44 @@
+from hashlib import sha256
+
+import numpy as np
+
+from .Store import Store
+
+
+def _encode(vector):
+    return np.asarray(vector, dtype = np.float32).tobytes()
+
+
+def _decode(blob: bytes):
+    return np.frombuffer(blob, dtype = np.float32).tolist()
+
+
+class EmbeddingCache:
+    """
+    Embeddings keyed by hash of the model name and the embedded text, vectors are stored as raw float32 blobs in a sqlite store
+    """
+
+    def __init__(self, cache_path: str = None, model: str = ''):
+        self.path = cache_path
+        self.model = model
+
+        self.store = Store(cache_path, table = 'vectors', encode = _encode, decode = _decode)
+
+    def key(self, text: str):
+        return sha256(f'{self.model}\n{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: [str]):
+        """
+        Return dict which maps keys to the cached vectors, missing keys are skipped
+        """
+
+        return {key: vector for key, (vector, _) in self.store.get_many(keys).items()}
+
+    def put_many(self, items: dict):
+        self.store.put_many(items)
+
+    def __len__(self):
+        return len(self.store)
+
+    def close(self):
+        self.store.close()
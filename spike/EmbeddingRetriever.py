@@ -0,0 +1,103 @@
+from json import dump
+from os import path, replace
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from tqdm import tqdm
+
+from .util import read_json
+from .SciQA import Subset
+from .Embedder import Embedder
+
+
+def _normalize(vectors: np.ndarray):
+    norms = np.linalg.norm(vectors, axis = -1, keepdims = True)
+
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+class EmbeddingRetriever:
+    """
+    Pick few-shot examples by cosine similarity between utterance embeddings.
+
+    Embeddings of the subset utterances are computed once and stored as a contiguous float32 matrix in a .npy file next to the dataset,
+    which is memory-mapped on subsequent runs
+    """
+
+    def __init__(self, subset: Subset, embedder: Embedder, batch_size: int = 16):
+        self.subset = subset
+        self.embedder = embedder
+        self.batch_size = batch_size
+
+        name = embedder.name.split('/')[-1]
+
+        vectors_path = subset.sibling(f'.{name}.npy')
+        meta_path = subset.sibling(f'.{name}.json')
+
+        meta = {'checksum': subset.checksum, 'model': embedder.name}
+
+        if not path.isfile(vectors_path) or not path.isfile(meta_path) or read_json(meta_path) != meta:
+            self._build(vectors_path, batch_size)
+
+            with open(meta_path, 'w', encoding = 'utf-8') as file:
+                dump(meta, file)
+
+        self.vectors = np.load(vectors_path, mmap_mode = 'r')
+
+    def _build(self, vectors_path: str, batch_size: int):
+        utterances = self.subset.utterances
+
+        tmp_path = f'{vectors_path}.tmp.npy'
+
+        if len(utterances) < 1:  # dimension of embeddings is unknown without embedding anything
+            np.save(tmp_path, np.empty((0, 0), dtype = np.float32))
+            replace(tmp_path, vectors_path)
+            return
+
+        vectors = None
+
+        for i in tqdm(range(0, len(utterances), batch_size), desc = 'Embedding utterances'):
+            batch = np.asarray(self.embedder.embed(utterances[i:i + batch_size]), dtype = np.float32)
+
+            if vectors is None:
+                vectors = open_memmap(tmp_path, mode = 'w+', dtype = np.float32, shape = (len(utterances), batch.shape[1]))
+
+            vectors[i:i + len(batch)] = _normalize(batch)
+
+        vectors.flush()
+        del vectors
+
+        replace(tmp_path, vectors_path)
+
+    def retrieve_many(self, utterances: [str], top_n: int):
+        if len(self.vectors) < 1:
+            return [[] for _ in utterances]
+
+        batch_size = self.batch_size
+
+        queries = _normalize(
+            np.asarray(
+                [
+                    embedding
+                    for i in range(0, len(utterances), batch_size)
+                    for embedding in self.embedder.embed(utterances[i:i + batch_size])
+                ],
+                dtype = np.float32
+            ).reshape(len(utterances), self.vectors.shape[1])
+        )
+        scores = queries @ self.vectors.T
+
+        entries = self.subset.entries
+
+        results = []
+
+        for item_scores in scores:
+            top = np.argpartition(-item_scores, top_n - 1)[:top_n] if top_n < len(item_scores) else np.arange(len(item_scores))
+            top = top[np.lexsort((top, -item_scores[top]))]
+
+            results.append([entries[i] for i in top.tolist()])
+
+        return results
+
+    def retrieve(self, utterance: str, top_n: int):
+        return self.retrieve_many([utterance], top_n)[0]
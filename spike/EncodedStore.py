@@ -0,0 +1,285 @@
+from functools import lru_cache
+from json import dump, load
+from os import path, makedirs, replace
+from shutil import rmtree
+
+import numpy as np
+from rdflib import Graph, Variable
+from rdflib.store import Store
+
+from .util import encode_term, decode_term, SEPARATOR
+from .NTriplesLoader import NTriplesLoader, is_ntriples
+
+
+# Every permutation is a sorted array of triples with columns taken from the (subject, predicate, object) triple in the given order,
+# columns are stored contiguously, because binary search over a strided column makes a copy of it
+
+PERMUTATIONS = {
+    'spo': (0, 1, 2),
+    'pos': (1, 2, 0),
+    'osp': (2, 0, 1)
+}
+
+BLOCK_SIZE = 1 << 16  # number of rows which are decoded at once when matching triples
+
+
+def stamp(graph_path: str):
+    return [path.abspath(graph_path), path.getmtime(graph_path), path.getsize(graph_path)]
+
+
+class Encoder:
+    """
+    Collects triples and writes them as a dictionary of terms and sorted permutation arrays, can be used as a sink of the n-triples parser
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.triples = []
+
+    def _id(self, key: str):
+        if (id_ := self.ids.get(key)) is None:
+            id_ = self.ids[key] = len(self.ids)
+
+        return id_
+
+    def add(self, keys: list):
+        """
+        Add triples given as a flat list of encoded terms
+        """
+
+        self.triples.extend(self._id(key) for key in keys)
+
+    def triple(self, subject, predicate, object_):
+        self.add((encode_term(subject), encode_term(predicate), encode_term(object_)))
+
+    def dump(self, store_path: str, meta: dict):
+        keys = sorted(self.ids, key = lambda key: key.encode('utf-8'))  # ids are assigned in the order of utf-8 bytes, which allows to look them up with binary search
+
+        remap = np.empty(len(keys), dtype = np.int64)
+        blobs = [key.encode('utf-8') for key in keys]
+
+        for i, key in enumerate(keys):
+            remap[self.ids[key]] = i
+
+        dtype = np.int32 if len(keys) < 2 ** 31 else np.int64
+
+        triples = np.unique(remap[np.array(self.triples, dtype = np.int64).reshape(-1, 3)].astype(dtype), axis = 0)  # drop duplicates
+
+        tmp_path = f'{store_path}.tmp'
+
+        if path.isdir(tmp_path):
+            rmtree(tmp_path)
+
+        makedirs(tmp_path)
+
+        with open(path.join(tmp_path, 'terms.bin'), 'wb') as file:
+            for blob in blobs:
+                file.write(blob)
+
+        offsets = np.zeros(len(blobs) + 1, dtype = np.int64)
+        offsets[1:] = np.cumsum([len(blob) for blob in blobs])
+
+        np.save(path.join(tmp_path, 'offsets.npy'), offsets)
+
+        for name, order in PERMUTATIONS.items():
+            permutation = triples[:, order]
+            np.save(path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(permutation[np.lexsort(permutation.T[::-1])].T))
+
+        with open(path.join(tmp_path, 'meta.json'), 'w', encoding = 'utf-8') as file:
+            dump({**meta, 'n_terms': len(blobs), 'n_triples': len(triples)}, file)
+
+        if path.isdir(store_path):
+            rmtree(store_path)
+
+        replace(tmp_path, store_path)
+
+
+class EncodedStore(Store):
+    """
+    Read-only rdflib store which keeps terms encoded as integers and triples in sorted spo, pos and osp arrays in memory-mapped files.
+
+    The store is opened without parsing anything, and every triple pattern is answered with binary search over one of the permutations,
+    so it can be used instead of the in-memory store as Graph(store = EncodedStore(path))
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, store_path: str, cache_size: int = 1 << 16):
+        super().__init__()
+
+        self.path = store_path
+
+        with open(path.join(store_path, 'meta.json'), 'r', encoding = 'utf-8') as file:
+            self.meta = load(file)
+
+        # Slices of plain arrays are much cheaper than slices of memmap objects, so memory-mapped files are viewed as plain arrays
+
+        self.terms = np.asarray(np.memmap(path.join(store_path, 'terms.bin'), dtype = np.uint8, mode = 'r')) if self.meta['n_terms'] > 0 else np.zeros(0, dtype = np.uint8)
+        self.offsets = np.asarray(np.load(path.join(store_path, 'offsets.npy'), mmap_mode = 'r'))
+
+        self.permutations = {
+            name: np.asarray(np.load(path.join(store_path, f'{name}.npy'), mmap_mode = 'r'))
+            for name in PERMUTATIONS
+        }
+
+        self._namespaces = {}
+        self._prefixes = {}
+
+        self.decode = lru_cache(maxsize = cache_size)(self._decode)
+        self.encode = lru_cache(maxsize = cache_size)(self._encode)
+
+    @classmethod
+    def build(cls, store_path: str, graph_path: str, workers: int = None):
+        """
+        Parse the graph and save its encoded version to store_path, n-triples files are parsed in parallel, other formats are parsed with rdflib first
+        """
+
+        encoder = Encoder()
+
+        if is_ntriples(graph_path):
+            loader = NTriplesLoader(workers)
+
+            for keys in loader.batches(graph_path):
+                encoder.add(keys)
+
+            print(f'Parsed {loader.report()}')
+        else:
+            graph = Graph()
+            graph.parse(graph_path)
+
+            for triple in graph:
+                encoder.triple(*triple)
+
+        encoder.dump(store_path, {'stamp': stamp(graph_path)})
+
+        return cls(store_path)
+
+    @classmethod
+    def load(cls, store_path: str, graph_path: str = None, workers: int = None):
+        """
+        Open store from store_path if it was built from the current version of the graph, otherwise build it again
+        """
+
+        if path.isfile(meta_path := path.join(store_path, 'meta.json')):
+            with open(meta_path, 'r', encoding = 'utf-8') as file:
+                meta = load(file)
+
+            if graph_path is None or not path.isfile(graph_path) or meta.get('stamp') == stamp(graph_path):
+                return cls(store_path)
+
+        return cls.build(store_path, graph_path, workers)
+
+    def _key(self, id_: int):
+        offsets = self.offsets
+
+        return self.terms[offsets[id_]:offsets[id_ + 1]].tobytes()
+
+    def _decode(self, id_: int):
+        return decode_term(self._key(id_).decode('utf-8'))
+
+    def _encode(self, term):
+        """
+        Return id of the term or -1 if the term does not occur in the graph
+        """
+
+        key = encode_term(term, exact = False).encode('utf-8')  # for literals this is a prefix of the stored key, which does not depend on the case of language tag
+
+        lo = 0
+        hi = self.meta['n_terms']
+
+        while lo < hi:
+            middle = (lo + hi) // 2
+
+            if self._key(middle) < key:
+                lo = middle + 1
+            else:
+                hi = middle
+
+        if lo >= self.meta['n_terms']:
+            return -1
+
+        found = self._key(lo)
+
+        if key[:1] == b'L':  # only the original language tag, which contains no separator, may follow the prefix of a literal
+            return lo if found.startswith(key) and SEPARATOR.encode('utf-8') not in found[len(key):] else -1
+
+        return lo if found == key else -1
+
+    def _match(self, ids: tuple):
+        bound = tuple(i for i, id_ in enumerate(ids) if id_ is not None)
+
+        if bound in ((1, ), (1, 2)):
+            name = 'pos'
+        elif bound in ((2, ), (0, 2)):
+            name = 'osp'
+        else:
+            name = 'spo'
+
+        order = PERMUTATIONS[name]
+        permutation = self.permutations[name]
+
+        lo = 0
+        hi = permutation.shape[1]
+
+        for column, component in enumerate(order):
+            if (id_ := ids[component]) is None:
+                break
+
+            values = permutation[column, lo:hi]
+            id_ = values.dtype.type(id_)  # python ints make numpy convert the whole array before the search
+
+            lo, hi = lo + int(values.searchsorted(id_, side = 'left')), lo + int(values.searchsorted(id_, side = 'right'))
+
+        subjects, predicates, objects = (permutation[order.index(component)] for component in range(3))
+
+        for start in range(lo, hi, BLOCK_SIZE):
+            end = min(start + BLOCK_SIZE, hi)
+
+            yield from zip(subjects[start:end].tolist(), predicates[start:end].tolist(), objects[start:end].tolist())
+
+    def triples(self, triple_pattern, context = None):
+        ids = []
+
+        for term in triple_pattern:
+            if term is None or isinstance(term, Variable):
+                ids.append(None)
+            elif (id_ := self.encode(term)) < 0:
+                return
+            else:
+                ids.append(id_)
+
+        decode_ = self.decode
+
+        for subject, predicate, object_ in self._match(tuple(ids)):
+            yield (decode_(subject), decode_(predicate), decode_(object_)), iter(())
+
+    def __len__(self, context = None):
+        return self.meta['n_triples']
+
+    def contexts(self, triple = None):
+        return iter(())
+
+    def add(self, triple, context, quoted = False):
+        raise TypeError('Encoded store is read-only')
+
+    def remove(self, triple, context = None):
+        raise TypeError('Encoded store is read-only')
+
+    def bind(self, prefix: str, namespace, override: bool = True, replace: bool = False):
+        if not override and prefix in self._namespaces:
+            return
+
+        self._namespaces[prefix] = namespace
+        self._prefixes[namespace] = prefix
+
+    def namespace(self, prefix: str):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefixes.get(namespace)
+
+    def namespaces(self):
+        yield from self._namespaces.items()
@@ -0,0 +1,155 @@
+from rdflib import Graph, Literal, URIRef, Variable
+from rdflib.namespace import RDFS
+from rdflib.plugins.sparql.algebra import Join, ToMultiSet, Values, traverse, translateQuery
+from rdflib.plugins.sparql.parser import parseQuery
+from rdflib.plugins.sparql.parserutils import CompValue
+
+
+REGEX_SPECIAL_CHARACTERS = set('.^$*+?{}[]\\|()')
+
+# Parts of algebra which must match for the whole expression to match, so restricting them doesn't change results of a filter above them
+
+MANDATORY_PARTS = {
+    'Join': ('p1', 'p2'),
+    'LeftJoin': ('p1', ),
+    'Filter': ('p', ),
+    'Extend': ('p', )
+}
+
+
+def _conjuncts(expr):
+    if isinstance(expr, CompValue) and expr.name == 'ConditionalAndExpression':
+        yield from _conjuncts(expr.expr)
+
+        for other in expr.other or ():
+            yield from _conjuncts(other)
+    else:
+        yield expr
+
+
+def _string_of(expr):
+    """
+    Return variable if expression is str(?variable)
+    """
+
+    if isinstance(expr, CompValue) and expr.name == 'Builtin_STR' and isinstance(expr.arg, Variable):
+        return expr.arg
+
+    return None
+
+
+def _label_constraint(expr):
+    """
+    Recognize filters of form str(?label) = "value", lcase(str(?label)) = "value" and regex(str(?label), "^value$", "i"),
+    return triple (variable, value, whether the comparison is case-sensitive) or None
+    """
+
+    if not isinstance(expr, CompValue):
+        return None
+
+    if expr.name == 'RelationalExpression' and expr.op == '=':
+        for lhs, rhs in ((expr.expr, expr.other), (expr.other, expr.expr)):
+            if not isinstance(rhs, Literal):
+                continue
+
+            if (variable := _string_of(lhs)) is not None:
+                return variable, str(rhs), True
+
+            if isinstance(lhs, CompValue) and lhs.name == 'Builtin_LCASE' and (variable := _string_of(lhs.arg)) is not None:
+                return variable, str(rhs), False
+
+        return None
+
+    if expr.name == 'Builtin_REGEX' and isinstance(pattern := expr.pattern, Literal):
+        variable = expr.text if isinstance(expr.text, Variable) else _string_of(expr.text)
+        flags = '' if expr.flags is None else str(expr.flags)
+        pattern = str(pattern)
+
+        if (
+            variable is not None and set(flags) <= {'i'} and len(pattern) > 1 and pattern[0] == '^' and pattern[-1] == '$' and
+            not REGEX_SPECIAL_CHARACTERS.intersection(pattern[1:-1])
+        ):
+            return variable, pattern[1:-1], 'i' not in flags
+
+    return None
+
+
+class LabelIndex:
+    """
+    Maps values of rdfs:label literals to pairs (subject, label) and uses them to evaluate label filters of sparql queries with lookups.
+
+    Filters are kept in the query, the index only restricts the basic graph pattern which binds the label to candidates found by lookup,
+    so that rdflib doesn't need to scan all labels
+    """
+
+    def __init__(self, graph: Graph):
+        labels = {}
+
+        for subject, _, label in graph.triples((None, RDFS.label, None)):
+            if (pairs := labels.get(key := str(label).lower())) is None:
+                pairs = labels[key] = []
+
+            pairs.append((subject, label))
+
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.labels)
+
+    def lookup(self, value: str, case_sensitive: bool = True):
+        pairs = self.labels.get(value.lower(), ())
+
+        if case_sensitive:
+            return [(subject, label) for subject, label in pairs if str(label) == value]
+
+        return pairs
+
+    def _restrict(self, part: CompValue, variable: Variable, pairs: list):
+        """
+        Join the basic graph pattern in which the variable is bound as a label with the candidate values, return None if there is no such pattern
+        """
+
+        if part.name == 'BGP':
+            for subject, predicate, object_ in part.triples:
+                if predicate == RDFS.label and object_ == variable and subject != variable:
+                    if isinstance(subject, Variable):
+                        rows = [{subject: subject_, variable: label} for subject_, label in pairs]
+                    elif isinstance(subject, URIRef):
+                        rows = [{variable: label} for subject_, label in pairs if subject_ == subject]
+                    else:
+                        continue
+
+                    join = Join(ToMultiSet(Values(rows)), part)
+                    join['lazy'] = True  # candidates are pushed into the pattern as bound variables
+
+                    return join
+
+            return None
+
+        for key in MANDATORY_PARTS.get(part.name, ()):
+            if isinstance(child := part.get(key), CompValue) and (restricted := self._restrict(child, variable, pairs)) is not None:
+                part[key] = restricted
+                return part
+
+        return None
+
+    def _rewrite(self, part):
+        if isinstance(part, CompValue) and part.name == 'Filter' and isinstance(part.p, CompValue):
+            for expr in _conjuncts(part.expr):
+                if (constraint := _label_constraint(expr)) is not None:
+                    variable, value, case_sensitive = constraint
+
+                    if (restricted := self._restrict(part.p, variable, self.lookup(value, case_sensitive))) is not None:
+                        part['p'] = restricted
+
+        return None  # keep the node, which has been changed in place
+
+    def prepare(self, query: str, namespaces: dict = None):
+        """
+        Parse query and restrict patterns which bind labels compared with constants in filters
+        """
+
+        prepared = translateQuery(parseQuery(query), initNs = namespaces or {})
+        prepared.algebra = traverse(prepared.algebra, visitPost = self._rewrite)
+
+        return prepared
@@ -0,0 +1,118 @@
+from collections import deque
+
+
+class LabelMatcher:
+    """
+    Aho-Corasick automaton over lowercased labels, which finds all labels occurring in a phrase in one pass over the phrase
+    """
+
+    def __init__(self, labels: [str]):
+        self.transitions = [{}]
+        self.outputs = [[]]  # ids of patterns which end in the node
+        self.lengths = []
+
+        patterns = {}
+        self.positions = []  # positions of labels which correspond to every pattern
+
+        for i, label in enumerate(labels):
+            pattern = label.lower()
+
+            if (pattern_id := patterns.get(pattern)) is None:
+                pattern_id = patterns[pattern] = len(self.lengths)
+
+                self.lengths.append(len(pattern))
+                self.positions.append([])
+
+                self._insert(pattern, pattern_id)
+
+            self.positions[pattern_id].append(i)
+
+        self._link()
+
+    def _insert(self, pattern: str, pattern_id: int):
+        node = 0
+
+        for char in pattern:
+            if (next_node := self.transitions[node].get(char)) is None:
+                next_node = self.transitions[node][char] = len(self.transitions)
+
+                self.transitions.append({})
+                self.outputs.append([])
+
+            node = next_node
+
+        self.outputs[node].append(pattern_id)
+
+    def _link(self):
+        transitions = self.transitions
+
+        self.failures = failures = [0] * len(transitions)
+        self.dictionary = dictionary = [0] * len(transitions)  # closest node along failure links which has outputs
+
+        queue = deque(transitions[0].values())
+
+        while queue:
+            node = queue.popleft()
+
+            for char, next_node in transitions[node].items():
+                failure = failures[node]
+
+                while failure and char not in transitions[failure]:
+                    failure = failures[failure]
+
+                failure = transitions[failure].get(char, 0)
+
+                failures[next_node] = failure
+                dictionary[next_node] = failure if self.outputs[failure] else dictionary[failure]
+
+                queue.append(next_node)
+
+    def find(self, phrase: str, whole_words: bool = False):
+        """
+        Return ids of patterns which occur in the phrase, with whole_words only occurrences surrounded by non-alphanumeric characters are taken into account
+        """
+
+        transitions = self.transitions
+        failures = self.failures
+        dictionary = self.dictionary
+        outputs = self.outputs
+        lengths = self.lengths
+
+        text = phrase.lower()
+        found = set()
+
+        if not whole_words:
+            found.update(outputs[0])  # empty labels are contained in any phrase
+
+        node = 0
+
+        for i, char in enumerate(text):
+            while node and char not in transitions[node]:
+                node = failures[node]
+
+            node = transitions[node].get(char, 0)
+
+            output = node if outputs[node] else dictionary[node]
+
+            while output:
+                for pattern_id in outputs[output]:
+                    if not whole_words or (
+                        (i + 1 == len(text) or not text[i + 1].isalnum()) and
+                        ((start := i + 1 - lengths[pattern_id]) == 0 or not text[start - 1].isalnum())
+                    ):
+                        found.add(pattern_id)
+
+                output = dictionary[output]
+
+        return found
+
+    def match(self, phrase: str, whole_words: bool = False):
+        """
+        Return positions of labels which occur in the phrase
+        """
+
+        return sorted(
+            i
+            for pattern_id in self.find(phrase, whole_words)
+            for i in self.positions[pattern_id]
+        )
@@ -0,0 +1,80 @@
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from gzip import open as open_gzip
+
+
+LABEL_LINE = re.compile(r'>(\s+)<\S+[A-Z]+[0-9]+>(\s+.+XMLSchema#string>)')
+LABEL = r'>\g<1><http://www.w3.org/2000/01/rdf-schema#label>\g<2>'
+
+MARKER = 'XMLSchema#string>'  # every line which can be matched by LABEL_LINE contains this substring
+
+BLOCK_SIZE = 1 << 22  # characters
+
+
+def _open(file_path: str, mode: str):
+    if file_path.endswith('.gz'):
+        return open_gzip(file_path, f'{mode}t', encoding = 'utf-8')
+
+    return open(file_path, mode, encoding = 'utf-8')
+
+
+def rewrite(block: str):
+    """
+    Replace predicates of string literals with rdfs:label in a block of complete lines
+    """
+
+    if MARKER not in block:
+        return block
+
+    return '\n'.join(
+        LABEL_LINE.sub(LABEL, line) if MARKER in line else line
+        for line in block.split('\n')
+    )
+
+
+class LabelNormalizer:
+    """
+    Rewrites n-triples file block by block, blocks are optionally processed in a pool of processes and written in the original order
+    """
+
+    def __init__(self, workers: int = 1, block_size: int = BLOCK_SIZE):
+        self.workers = workers
+        self.block_size = block_size
+
+    def _blocks(self, file):
+        rest = ''
+
+        while block := file.read(self.block_size):
+            if (end := block.rfind('\n')) < 0:
+                rest += block
+                continue
+
+            yield rest + block[:end + 1]
+
+            rest = block[end + 1:]
+
+        if rest:
+            yield rest[:-1] + '\n'  # the last character of the unterminated last line is dropped, as it has always been done for every line
+
+    def _rewritten(self, blocks):
+        if self.workers < 2:
+            yield from map(rewrite, blocks)
+            return
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            pending = deque()
+
+            for block in blocks:
+                pending.append(executor.submit(rewrite, block))
+
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def normalize(self, input_path: str, output_path: str):
+        with _open(input_path, 'r') as input_file, _open(output_path, 'w') as output_file:
+            for block in self._rewritten(self._blocks(input_file)):
+                output_file.write(block)
@@ -0,0 +1,149 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from gzip import GzipFile
+from os import cpu_count, path
+from time import monotonic
+
+from rdflib import Graph
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from tqdm import tqdm
+
+from .util import encode_term, decode_term
+
+
+CHUNK_SIZE = 1 << 22  # bytes
+
+
+def is_ntriples(graph_path: str):
+    return graph_path.endswith('.nt') or graph_path.endswith('.nt.gz')
+
+
+class _Labels(dict):
+    """
+    Blank node context which maps every label to itself, so that the same label denotes the same node in all chunks of the file
+    """
+
+    def get(self, key, default = None):
+        return key
+
+
+class _Sink:
+    def __init__(self):
+        self.keys = []
+
+    def triple(self, subject, predicate, object_):
+        self.keys.extend((encode_term(subject), encode_term(predicate), encode_term(object_)))
+
+
+def _parse(chunk: bytes):
+    """
+    Parse a chunk of complete n-triples lines and return a flat list with encoded terms of the triples
+    """
+
+    parser = W3CNTriplesParser(sink = _Sink())
+    parser.parsestring(chunk, bnode_context = _Labels())
+
+    return parser.sink.keys
+
+
+class NTriplesLoader:
+    """
+    Splits n-triples file (optionally gzip-compressed) into chunks at line boundaries and parses the chunks in a pool of processes
+    """
+
+    def __init__(self, workers: int = None, chunk_size: int = CHUNK_SIZE, progress: bool = True):
+        self.workers = (cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.progress = progress
+
+        self.n_triples = 0
+        self.elapsed = 0.0
+
+    @property
+    def rate(self):
+        return self.n_triples / self.elapsed if self.elapsed > 0 else 0.0
+
+    def _chunks(self, file, raw):
+        """
+        Yield pairs (chunk, position in the raw file after the chunk has been read)
+        """
+
+        rest = b''
+
+        while block := file.read(self.chunk_size):
+            if (end := block.rfind(b'\n')) < 0:
+                rest += block
+                continue
+
+            yield rest + block[:end + 1], raw.tell()
+
+            rest = block[end + 1:]
+
+        if rest:
+            yield rest, raw.tell()
+
+    def batches(self, graph_path: str):
+        """
+        Yield lists of encoded terms of parsed triples in the order of chunks in the file
+        """
+
+        start = monotonic()
+
+        self.n_triples = 0
+
+        with open(graph_path, 'rb') as raw, tqdm(
+            total = path.getsize(graph_path), unit = 'B', unit_scale = True, desc = 'Parsing graph', disable = not self.progress
+        ) as progress:
+            file = GzipFile(fileobj = raw) if graph_path.endswith('.gz') else raw
+
+            def done(keys: list, position: int):
+                self.n_triples += len(keys) // 3
+                progress.update(position - progress.n)
+                progress.set_postfix(triples = self.n_triples, refresh = False)
+
+                return keys
+
+            if self.workers < 2:
+                for chunk, position in self._chunks(file, raw):
+                    yield done(_parse(chunk), position)
+            else:
+                with ProcessPoolExecutor(self.workers) as executor:
+                    pending = deque()  # chunks are submitted ahead of time, but not all at once to keep memory bounded
+
+                    for chunk, position in self._chunks(file, raw):
+                        pending.append((executor.submit(_parse, chunk), position))
+
+                        if len(pending) >= self.workers * 2:
+                            future, position = pending.popleft()
+                            yield done(future.result(), position)
+
+                    while pending:
+                        future, position = pending.popleft()
+                        yield done(future.result(), position)
+
+        self.elapsed = monotonic() - start
+
+    def load(self, graph_path: str, graph: Graph = None):
+        """
+        Parse triples into an rdflib graph, terms which occur many times are shared between triples
+        """
+
+        graph = Graph() if graph is None else graph
+        terms = {}
+
+        def term(key: str):
+            if (value := terms.get(key)) is None:
+                value = terms[key] = decode_term(key)
+
+            return value
+
+        for keys in self.batches(graph_path):
+            graph.addN(
+                (term(keys[i]), term(keys[i + 1]), term(keys[i + 2]), graph)
+                for i in range(0, len(keys), 3)
+            )
+
+        return graph
+
+    def report(self):
+        return f'{self.n_triples} triples in {self.elapsed:.3f} s ({self.rate:.0f} triples/s)'
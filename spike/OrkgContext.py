@@ -1,19 +1,25 @@
 from os import path
+from itertools import islice, chain
+from queue import SimpleQueue
+from threading import Lock
+from json import JSONDecodeError
 import pickle as pkl
 
 from rdflib import Graph
 from pyparsing.exceptions import ParseException
 
-from .util import read
+from .util import read, iter_bindings, BindingsNotFoundError
 
 from .ClassContextEntry import ClassContextEntry
 from .PrefixContextEntry import PrefixContextEntry
 from .PropertyContextEntry import PropertyContextEntry
 from .SciQA import SciQA
+from .LabelMatcher import LabelMatcher
 from .similarity import rank
+from .Transport import Transport
+from .QueryWorker import QueryWorker, QueryCrashError, WorkerExitedError, iter_rows, flatten
+from .LabelIndex import LabelIndex
 
-from requests import get
-from requests.exceptions import JSONDecodeError
 
 HEADER = '''
 prefix orkgp: <http://orkg.org/orkg/predicate/>
@@ -29,6 +35,10 @@ PREFIXES = {
     'http://www.w3.org/1999/02/22-rdf-syntax-ns': 'r'
 }
 
+N_EXAMPLES = 3
+CONTEXT_PATH = path.join('assets', 'cache', 'orkg-context.pkl')
+CHUNK_SIZE = 1 << 16  # bytes, size of blocks in which responses of the remote triplestore are read
+
 TRAILERS = {
     'w': '#',
     'r': '#',
@@ -36,11 +46,38 @@ TRAILERS = {
 }
 
 
+def _stamp(file_path: str):
+    if not path.isfile(file_path):
+        return None
+
+    return path.getmtime(file_path), path.getsize(file_path)
+
+
 class OrkgContext:
     root = 'https://orkg.org/{path}'
 
-    def __init__(self, cache_path: str = path.join('assets', 'cache', 'orkg-context.pkl'), fresh: bool = False, graph: Graph = None):
+    def __init__(
+        self, cache_path: str = CONTEXT_PATH, fresh: bool = False, graph: Graph = None, transport: Transport = None,
+        query_timeout: float = None, max_results: int = None, labels: LabelIndex = None, query_workers: int = 1
+    ):
         self.graph = graph
+        self.labels = labels
+        self.transport = Transport.shared() if transport is None else transport
+        self.cache_path = cache_path
+
+        # Budget of queries to the local graph, with timeout queries are executed in worker processes which kill queries when time runs out.
+        # Workers are forked right away, while the caller has not started any threads yet
+
+        self.query_timeout = query_timeout
+        self.max_results = max_results
+        self._workers = SimpleQueue()  # idle workers, None means that all of them have exited
+        self._n_workers = 0
+        self._workers_lock = Lock()
+
+        if graph is not None and query_timeout is not None:
+            for _ in range(max(1, query_workers)):
+                self._workers.put(QueryWorker(graph, query_timeout, max_results, labels))
+                self._n_workers += 1
 
         # 0. Read SciQA dataset (which caches itself)
 
@@ -51,15 +88,18 @@ class OrkgContext:
         if not fresh and path.isfile(cache_path):
             with open(cache_path, 'rb') as file:
                 self.context = pkl.load(file)
-                return
+
+            self.cache_stamp = _stamp(cache_path)
+            self._compile()
+            return
 
         # 2. Get class context data from the knowledge graph
 
-        classes = self.get_triples(
+        classes = self.get_bindings(
             read('assets/queries/classes.rq')
         )
 
-        properties = self.get_triples(
+        properties = self.get_bindings(
             read('assets/queries/properties.rq')
         )
 
@@ -80,16 +120,45 @@ class OrkgContext:
         with open(cache_path, 'wb') as file:
             pkl.dump(context, file)
 
-    def cut(self, phrase: str, matches: callable = lambda entry, phrase: entry.label.lower() in phrase.lower()):
-        examples = rank(phrase, self.sciqa.train.entries, top_n = 3, get_utterance = lambda entry: entry.utterance)
+        self.cache_stamp = _stamp(cache_path)
+        self._compile()
+
+    def _compile(self):
+        labelled = [
+            i
+            for i, entry in enumerate(self.context)
+            if entry is not None and entry.mark != PrefixContextEntry.mark
+        ]
+
+        self.labelled = labelled
+        self.matcher = LabelMatcher([self.context[i].label for i in labelled])
+
+    @property
+    def stale(self):
+        """
+        Whether the cache file has been changed since the context was loaded
+        """
+
+        return _stamp(self.cache_path) != self.cache_stamp
+
+    def cut(self, phrase: str, matches: callable = None, examples: list = None, whole_words: bool = False):
+        if examples is None:
+            train = self.sciqa.train
+
+            examples = rank(phrase, train.entries, top_n = N_EXAMPLES, get_utterance = lambda entry: entry.utterance, index = train.index)
+
+        if matches is None:  # find all labels in one pass over the phrase instead of checking them one by one
+            matched = {self.labelled[i] for i in self.matcher.match(phrase, whole_words)}
+        else:
+            matched = {i for i in self.labelled if matches(self.context[i], phrase)}
 
         return examples, '\n'.join([
             '' if entry is None else entry.description
-            for entry in self.context
+            for i, entry in enumerate(self.context)
             if (
                 entry is None or
                 entry.mark == PrefixContextEntry.mark or
-                matches(entry, phrase)
+                i in matched
             )
         ])
 
@@ -101,35 +170,111 @@ class OrkgContext:
     def triplestore(self):
         return self.root.format(path = 'triplestore')
 
-    def get_triples(self, query: str):
+    def iter_triples(self, query: str, limit: int = None, offset: int = 0):
+        """
+        Lazily yield rows of query results as dicts which map variable names to cells.
+
+        Cells are json bindings for the remote triplestore and rdflib terms (None if the variable is unbound) for the local graph
+        """
+
         # prefixes = PrefixContextEntry.from_dict(PREFIXES, TRAILERS)
         # header = '\n'.join([prefix.description for prefix in prefixes])
 
         query = f'{HEADER}\n{query}'
 
+        stop = None if limit is None else offset + limit
+
         # print(query)
 
         if self.graph is None:
-            response = get(self.triplestore, {'query': query}, headers = {'Accept': 'application/sparql-results+json'}, timeout = 120)
-
-            # print(response.text)
-
-            try:
-                return response.json()['results']['bindings']
-            except JSONDecodeError:
-                print(f'Cannot extract entries from response {response.text}. Returning an empty list...')
-                return []
+            with self.transport.get(self.triplestore, {'query': query}, headers = {'Accept': 'application/sparql-results+json'}, stream = True) as response:
+                try:
+                    yield from islice(iter_bindings(response.iter_content(CHUNK_SIZE)), offset, stop)
+                except (BindingsNotFoundError, JSONDecodeError) as e:
+                    print(f'Cannot extract entries from response: {e}. Returning an empty list...')
         else:
+            rows = iter_rows(self.graph, query, self.labels)
+
             try:
-                response = self.graph.query(query)
+                first = next(rows, None)  # the query is parsed and evaluation starts on the first step
             except Exception:
                 print('Cannot execute query!!!')
                 print(query)
 
-                return []
+                return
+
+            if first is not None:
+                yield from islice(chain((first, ), rows), offset, stop)
+
+    def get_bindings(self, query: str):
+        """
+        Return rows of query results as json bindings, terms from the local graph are converted to bindings which contain only values
+        """
+
+        if self.graph is None:
+            return list(self.iter_triples(query))
+
+        return [
+            {name: {'value': str(cell)} for name, cell in row.items() if cell is not None}
+            for row in self.iter_triples(query)
+        ]
+
+    def _drop_worker(self):
+        """
+        Forget a worker which has exited, when the last one is gone, every waiting and future query fails
+        """
+
+        with self._workers_lock:
+            self._n_workers -= 1
+            n_workers = self._n_workers
+
+        if n_workers < 1:
+            self._workers.put(None)
+
+        return n_workers
+
+    def _run_in_worker(self, query: str):
+        if (worker := self._workers.get()) is None:  # waits until one of the workers is idle
+            self._workers.put(None)
+            raise RuntimeError('All query workers have exited')
+
+        try:
+            return worker.run(f'{HEADER}\n{query}')
+        except WorkerExitedError as e:
+            worker = None
+            print(f'{e}, {self._drop_worker()} query workers are left')
+
+            return None
+        except QueryCrashError as e:  # the result is unknown rather than empty, so it must not be cached
+            print(e)
+
+            return None
+        except RuntimeError:
+            print('Cannot execute query!!!')
+            print(query)
+
+            return []
+        finally:
+            if worker is not None:
+                self._workers.put(worker)
+
+    def close(self):
+        while not self._workers.empty():
+            if (worker := self._workers.get()) is not None:
+                worker.close()
+
+    def get_triples(self, query: str, bounded: bool = True):
+        """
+        Return flat list of query results.
+
+        If bounded, queries to the local graph are subject to the time and result size budget, and None is returned for queries which run out of time
+        or whose process crashes, since their results are unknown
+        """
+
+        if self.graph is None:
+            return list(self.iter_triples(query))
+
+        if bounded and self.query_timeout is not None:
+            return self._run_in_worker(query)
 
-            return [
-                str(cell)
-                for row in response
-                for cell in row
-            ]
+        return flatten(self.iter_triples(query, limit = self.max_results if bounded else None))
@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from queue import Queue, Empty, Full
+from threading import Event, Lock, Thread
+
+
+POLL_INTERVAL = 0.1  # seconds, how often blocked threads check whether the pipeline has been stopped
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    function: callable
+    concurrency: int = 1
+
+    def __post_init__(self):
+        if self.concurrency < 1:
+            raise ValueError(f'Stage {self.name} must be executed by at least one thread, got concurrency {self.concurrency}')
+
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues, every stage is executed by its own pool of threads.
+
+    Items are passed to the next stage as soon as they are processed, so slow stages of different items overlap,
+    and bounded queues keep fast stages from running too far ahead of slow ones. Outputs are yielded in the order of completion
+    """
+
+    def __init__(self, stages: [Stage], queue_size: int = 16):
+        for stage in stages:
+            if stage.concurrency < 1:  # stage could have been changed after creation
+                raise ValueError(f'Stage {stage.name} must be executed by at least one thread, got concurrency {stage.concurrency}')
+
+        self.stages = stages
+        self.queue_size = queue_size
+
+        self._stop = Event()
+        self._error = None
+        self._lock = Lock()
+
+    def _fail(self, error: Exception):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+        self._stop.set()
+
+    def _put(self, queue: Queue, item):
+        while not self._stop.is_set():
+            try:
+                queue.put(item, timeout = POLL_INTERVAL)
+                return True
+            except Full:
+                pass
+
+        return False
+
+    def _get(self, queue: Queue):
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout = POLL_INTERVAL)
+            except Empty:
+                pass
+
+        return _DONE
+
+    def _feed(self, items, output: Queue):
+        try:
+            for item in items:
+                if not self._put(output, item):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+
+        self._put(output, _DONE)
+
+    def _work(self, stage: Stage, input_: Queue, output: Queue, alive: list):
+        try:
+            while (item := self._get(input_)) is not _DONE:
+                if not self._put(output, stage.function(item)):
+                    return
+        except Exception as e:
+            self._fail(e)
+            return
+
+        self._put(input_, _DONE)  # let other threads of the same stage see the end of input
+
+        with self._lock:
+            alive[0] -= 1
+            last = alive[0] == 0
+
+        if last:
+            self._put(output, _DONE)
+
+    def run(self, items):
+        """
+        Pass items through all stages and yield outputs of the last stage, the first exception raised by any stage is re-raised here
+        """
+
+        queues = [Queue(maxsize = self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [Thread(target = self._feed, args = (items, queues[0]), daemon = True, name = 'feed')]
+
+        for stage, input_, output in zip(self.stages, queues[:-1], queues[1:]):
+            alive = [stage.concurrency]
+
+            threads.extend(
+                Thread(target = self._work, args = (stage, input_, output, alive), daemon = True, name = f'{stage.name}-{i}')
+                for i in range(stage.concurrency)
+            )
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (item := self._get(queues[-1])) is not _DONE:
+                yield item
+        finally:
+            self._stop.set()
+
+            for thread in threads:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
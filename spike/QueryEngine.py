@@ -1,38 +1,91 @@
-from requests import get
+from time import monotonic
+
+from requests.exceptions import RequestException, Timeout
+
+from .Transport import Transport
+from .util import iter_bindings
 
 
 TIMEOUT = 3600  # seconds
+CHUNK_SIZE = 1 << 16  # bytes
+
+# 500 and 504 may come after a long evaluation of the query, so resending it could take hours, only statuses which mean that the query was not run are retried
+
+RETRY_STATUSES = (429, 502, 503)
+TRANSIENT_STATUSES = (408, 429)  # besides server errors, the query may succeed if it is sent later
+
+
+class QueryError(Exception):
+    """
+    Query failed in a way which doesn't change if it is sent again, e.g. the endpoint rejected it or its results can't be parsed
+    """
 
 
 class QueryEngine:
     root = 'https://orkg.org/SciQA'
 
-    def __init__(self):
-        pass
-
-    def run(self, query: str, id_: str):
-        response = get(
-            self.root,
-            {
-                'query': query
-            },
-            headers = {
-                'Accept': 'application/sparql-results+json'
-            },
-            timeout = TIMEOUT
-        )
+    def __init__(self, transport: Transport = None):
+        self.transport = Transport.shared() if transport is None else transport
+
+    def run(self, query: str, id_: str, deadline: float = None):
+        """
+        Execute query and return flat list of values.
+
+        None is returned if the query fails for a transient reason (deadline in seconds runs out, the endpoint stays unavailable after retries
+        or the connection breaks), so that the result is not mistaken for an empty one. Permanent failures are raised as QueryError
+        """
+
+        started = monotonic()
+
+        def timed_out(error: Exception = None):
+            return isinstance(error, Timeout) or (deadline is not None and monotonic() - started >= deadline)
 
         try:
-            data = response.json()
-
-            return [
-                cell['value']
-                for row in data['results']['bindings']
-                for _, cell in row.items()
-            ]
-        except Exception as e:
-            print(f'Cannot execute query "{id_}"')
-            print(query)
-            print(e)
-
-            return []
+            response = self.transport.get(
+                self.root,
+                {
+                    'query': query
+                },
+                headers = {
+                    'Accept': 'application/sparql-results+json'
+                },
+                read_timeout = TIMEOUT,
+                stream = True,
+                deadline = deadline,
+                retry_statuses = RETRY_STATUSES
+            )
+        except Timeout:
+            print(f'Query "{id_}" timed out')
+            return None
+        except RequestException as e:  # connection errors which persisted after retries
+            print(f'Cannot send query "{id_}": {e}')
+            return None
+
+        with response:
+            if response.status_code in TRANSIENT_STATUSES or response.status_code >= 500:
+                print(f'Query "{id_}" failed with status {response.status_code}')
+                return None
+
+            if response.status_code >= 400:
+                raise QueryError(f'Endpoint rejected the query with status {response.status_code}: {response.text[:1024]}')
+
+            try:
+                values = []
+
+                for row in iter_bindings(response.iter_content(CHUNK_SIZE)):
+                    if timed_out():
+                        raise Timeout()
+
+                    values.extend(cell['value'] for cell in row.values())
+
+                return values
+            except ValueError as e:  # malformed json or missing bindings
+                raise QueryError(f'Cannot parse results: {e}') from e
+            except Exception as e:
+                if timed_out(e):  # a stalled read of the response body is reported as a connection error
+                    print(f'Query "{id_}" timed out')
+                    return None
+
+                print(f'Cannot read results of query "{id_}": {e}')
+
+                return None
@@ -0,0 +1,164 @@
+from itertools import islice
+from multiprocessing import Pipe, get_context
+from os import fork, kill, waitpid, _exit
+from signal import SIGKILL
+from threading import Lock
+
+from rdflib import Graph
+
+from .LabelIndex import LabelIndex
+
+
+QUERY_TIMEOUT = 120  # seconds
+
+
+class QueryCrashError(RuntimeError):
+    """
+    Query was not executed to the end because a process crashed, unlike errors of the query itself it may succeed if it is retried
+    """
+
+
+class WorkerExitedError(QueryCrashError):
+    """
+    Worker process is gone, so it can't execute any more queries
+    """
+
+
+def iter_rows(graph: Graph, query: str, labels: LabelIndex = None):
+    """
+    Execute query against the local graph and lazily yield rows of results as dicts which map variable names to rdflib terms
+    """
+
+    response = graph.query(query if labels is None else labels.prepare(query, dict(graph.namespaces())))
+
+    if response.type == 'ASK':
+        yield {'boolean': response.askAnswer}
+    else:
+        names = ('subject', 'predicate', 'object') if response.vars is None else [str(var) for var in response.vars]
+        yield from (dict(zip(names, row)) for row in response)
+
+
+def flatten(rows):
+    return [
+        str(cell)
+        for row in rows
+        for cell in row.values()
+    ]
+
+
+def _execute(graph: Graph, labels: LabelIndex, query: str, max_results: int, connection):
+    try:
+        connection.send((True, flatten(islice(iter_rows(graph, query, labels), max_results))))
+    except Exception as e:
+        connection.send((False, repr(e)))
+
+
+def _serve(graph: Graph, labels: LabelIndex, connection, timeout: float, max_results: int):
+    """
+    Execute every received query in a child process, which is killed if it doesn't send results within the timeout.
+
+    This process is single-threaded, so unlike the parent it can fork safely at any moment
+    """
+
+    while True:
+        try:
+            query = connection.recv()
+        except EOFError:
+            return
+
+        reader, writer = Pipe(duplex = False)
+
+        if (pid := fork()) == 0:
+            reader.close()
+
+            try:
+                _execute(graph, labels, query, max_results, writer)
+            finally:
+                _exit(0)
+
+        writer.close()
+
+        if reader.poll(timeout):
+            try:
+                result = reader.recv()
+            except EOFError:
+                result = (None, 'Query process exited unexpectedly')
+        else:
+            kill(pid, SIGKILL)
+            result = None
+
+        waitpid(pid, 0)
+        reader.close()
+
+        connection.send(result)
+
+
+class QueryWorker:
+    """
+    Forked process which executes queries against a local graph, the graph is shared with the parent process and is not copied.
+
+    The worker is forked when it is created, so it must be created before the parent starts any threads, forking a multi-threaded process
+    may copy locks held by other threads. Every query is executed in a grandchild process, which the worker kills if the query runs out of time
+    """
+
+    def __init__(self, graph: Graph, timeout: float = QUERY_TIMEOUT, max_results: int = None, labels: LabelIndex = None):
+        self.graph = graph
+        self.labels = labels
+        self.timeout = timeout
+        self.max_results = max_results
+
+        self._lock = Lock()
+
+        self._connection, child_connection = get_context('fork').Pipe()
+
+        self._process = get_context('fork').Process(
+            target = _serve, args = (graph, labels, child_connection, timeout, max_results), daemon = True
+        )
+        self._process.start()
+
+        child_connection.close()
+
+    def run(self, query: str):
+        """
+        Return flat list of values from the query results or None if the query timed out.
+
+        Errors of the query are raised as RuntimeError, crashes of the process which executed the query are raised as QueryCrashError,
+        and WorkerExitedError means that the worker itself is gone
+        """
+
+        with self._lock:
+            if self._process is None:
+                raise WorkerExitedError('Query worker has been closed')
+
+            try:
+                self._connection.send(query)
+                result = self._connection.recv()
+            except (EOFError, OSError):
+                self.kill()
+                raise WorkerExitedError('Query worker exited unexpectedly')
+
+        if result is None:
+            return None
+
+        succeeded, payload = result
+
+        if succeeded is None:
+            raise QueryCrashError(payload)
+
+        if not succeeded:
+            raise RuntimeError(payload)
+
+        return payload
+
+    def kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._connection.close()
+
+            self._process = None
+            self._connection = None
+
+    def close(self):
+        with self._lock:
+            self.kill()
@@ -3,13 +3,17 @@
 """Read RDF files."""
 
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
 from llama_index.readers.base import BaseReader
 from llama_index.readers.schema.base import Document
 
 from tqdm import tqdm
 
+from .NTriplesLoader import NTriplesLoader, is_ntriples
+from .util import encode_term, decode_term
+
 
 class RDFReader(BaseReader):
     """RDF reader."""
@@ -62,64 +66,118 @@ class RDFReader(BaseReader):
 
         # raise Exception(f"Label not found for: {uri}")
 
-    def load_data(
-        self, file: Path, extra_info: Optional[Dict] = None, max_document_size: int = 512, embed: callable = None, batch_size: int = 4
-    ) -> List[Document]:
-        """Parse file."""
-
-        lang = extra_info["lang"] if extra_info is not None else "en"
+    def fetch_label_map(self, lang: str = "en", local_labels: Optional[Iterable] = None) -> Dict[Any, str]:
+        """Map every labelled URI to one of its labels, labels from the local graph (or given pairs of URI and label) take precedence over the global one."""
 
-        self.g_local = self.Graph()
-        self.g_local.parse(file)
+        if local_labels is None:
+            local_labels = ((uri, label) for uri, _, label in self.g_local.triples((None, self.RDFS.label, None)))
 
-        self.g_global = self.Graph()
-        self.g_global.parse(str(self.RDF))
-        self.g_global.parse(str(self.RDFS))
+        global_labels = ((uri, label) for uri, _, label in self.g_global.triples((None, self.RDFS.label, None)))
 
-        text_list = []
-        documents = []
-        batch = []
+        label_map = {}
 
-        n_triples = int(
-            list(
-                self.g_local.query('select (count(*) as ?cc) where { ?s ?p ?o }')
-            )[0][0]
-        )
+        for uri, label in chain(local_labels, global_labels):
+            if label.language in [lang, None] and uri not in label_map:
+                label_map[uri] = label.value
 
-        def add():
-            nonlocal documents, text_list, batch
+        return label_map
 
-            text = '\n'.join(text_list)
-
-            document = Document(text = text)
+    def _load_global(self):
+        self.g_global = self.Graph()
+        self.g_global.parse(str(self.RDF))
+        self.g_global.parse(str(self.RDFS))
 
-            documents.append(document)
-            batch.append(document)
+    def _iter_documents(self, triples: Iterable, n_triples: int, label_map: Dict[Any, str], max_document_size: int) -> Iterator[Document]:
+        def label(uri: Any):
+            return label_map[uri] if uri in label_map else str(uri)
 
-            if len(batch) >= batch_size:
-                embed(batch)
-                batch = []
+        text_list = []
 
         with tqdm(total = n_triples) as pbar:
-            for s, p, o in self.g_local:
+            for s, p, o in triples:
                 if p == self.RDFS.label:
                     pbar.update()
                     continue
                 triple = (
-                    f"<{self.fetch_label_in_graphs(s, lang=lang)}> "
-                    f"<{self.fetch_label_in_graphs(p, lang=lang)}> "
-                    f"<{self.fetch_label_in_graphs(o, lang=lang)}>"
+                    f"<{label(s)}> "
+                    f"<{label(p)}> "
+                    f"<{label(o)}>"
                 )
                 text_list.append(triple)
 
                 if len(text_list) >= max_document_size:
-                    add()
+                    yield Document(text = '\n'.join(text_list))
                     text_list = []
 
                 pbar.update()
 
         if len(text_list) > 0:
-            add()
+            yield Document(text = '\n'.join(text_list))
+
+    def iter_data(
+        self, file: Path, extra_info: Optional[Dict] = None, max_document_size: int = 512, workers: int = None
+    ) -> Iterator[Document]:
+        """Lazily yield documents, the next document is generated only after the previous one has been consumed.
+
+        N-Triples files are read from disk twice (first for labels, then for triples), so that neither the graph nor the documents are kept in memory."""
+
+        lang = extra_info["lang"] if extra_info is not None else "en"
+
+        self._load_global()
+
+        if not is_ntriples(str(file)):
+            self.g_local = self.Graph()
+            self.g_local.parse(file)
+
+            yield from self._iter_documents(self.g_local, len(self.g_local), self.fetch_label_map(lang), max_document_size)
+            return
+
+        loader = NTriplesLoader(workers, progress = False)
+        label_key = encode_term(self.RDFS.label)
+
+        local_labels = []
+        n_triples = 0
+
+        for keys in loader.batches(str(file)):
+            n_triples += len(keys) // 3
+
+            for i in range(1, len(keys), 3):
+                if keys[i] == label_key:
+                    local_labels.append((decode_term(keys[i - 1]), decode_term(keys[i + 1])))
+
+        label_map = self.fetch_label_map(lang, local_labels)
+        del local_labels
+
+        triples = (
+            (decode_term(keys[i]), decode_term(keys[i + 1]), decode_term(keys[i + 2]))
+            for keys in loader.batches(str(file))
+            for i in range(0, len(keys), 3)
+        )
+
+        yield from self._iter_documents(triples, n_triples, label_map, max_document_size)
+
+    def load_data(
+        self, file: Path, extra_info: Optional[Dict] = None, max_document_size: int = 512, embed: callable = None, batch_size: int = 4
+    ) -> List[Document]:
+        """Parse file."""
+
+        lang = extra_info["lang"] if extra_info is not None else "en"
+
+        self.g_local = self.Graph()
+        self.g_local.parse(file)
+
+        self._load_global()
+
+        documents = []
+        batch = []
+
+        for document in self._iter_documents(self.g_local, len(self.g_local), self.fetch_label_map(lang), max_document_size):
+            documents.append(document)
+            batch.append(document)
+
+            if len(batch) >= batch_size:
+                embed(batch)
+                batch = []
 
         if len(batch) > 0:
             embed(batch)
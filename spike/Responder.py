@@ -1,11 +1,14 @@
-from time import sleep
 from os import path
-from pickle import load, dump
+from pickle import load
 
-from openai import ChatCompletion as cc
 from rdflib import Graph
 
-from .OrkgContext import OrkgContext
+from .OrkgContext import OrkgContext, CONTEXT_PATH
+from .ResultCache import ResultCache, MAX_SIZE
+from .Store import Store
+from .ChatClient import ChatClient
+from .LabelIndex import LabelIndex
+from .Tracer import Tracer
 
 
 NEW_LINE = '\n'
@@ -29,76 +32,156 @@ Generate SPARQL query which allows to answer the question "{question}".
 '''
 
 
-def load_cache(cache_path: str):
-    if cache_path is not None and path.isfile(cache_path):
-        with open(cache_path, 'rb') as file:
-            return load(file)
+def import_pickle(pickle_path: str, imports: Store, put: callable):
+    """
+    Pass content of a pickled cache written by previous versions to the put callback, every version of the file is imported only once
+    """
 
-    return None
+    if pickle_path is None or not path.isfile(pickle_path):
+        return 0
 
+    key = path.abspath(pickle_path)
+    stamp = [path.getmtime(pickle_path), path.getsize(pickle_path)]
 
-def dump_cache(cache_path: str, content):
-    if cache_path is not None:
-        with open(cache_path, 'wb') as file:
-            dump(content, file)
+    if (entry := imports.get(key)) is not None and entry[0] == stamp:
+        return 0
+
+    with open(pickle_path, 'rb') as file:
+        content = load(file)
+
+    put(content)
+    imports.put(key, stamp)
+
+    return len(content)
+
+
+def extract_query(answer: str):
+    parts = answer.replace('```sparql', '```').split('```')
+
+    if len(parts) != 3:
+        return answer
+        # raise ValueError(f'Can\'t extract query from answer "{answer}"')
+
+    return parts[1]
 
 
 class Responder:
-    def __init__(self, query_cache_path: str, answer_cache_path: str, graph: Graph = None):
+    def __init__(
+        self, query_cache_path: str, answer_cache_path: str, graph: Graph = None, graph_id: str = None,
+        legacy_query_cache_path: str = None, legacy_answer_cache_path: str = None, client: ChatClient = None,
+        query_timeout: float = None, max_results: int = None, label_index: bool = True, context_path: str = CONTEXT_PATH,
+        tracer: Tracer = None, query_workers: int = 1, answer_cache_size: int = MAX_SIZE, answer_cache_ttl: float = None
+    ):
+        if graph is not None and graph_id is None:  # results are cached durably, so the key must identify the graph across runs
+            raise ValueError('If graph is given, then graph id must be given too')
+
         self.query_cache_path = query_cache_path
         self.answer_cache_path = answer_cache_path
 
-        self.query_cache = load_cache(query_cache_path)
-        self.answer_cache = load_cache(answer_cache_path)
+        self.query_cache = Store(query_cache_path, table = 'queries')
+        self.answer_cache = ResultCache(answer_cache_path, max_size = answer_cache_size, ttl = answer_cache_ttl)
 
         self.graph = graph
+        self.graph_id = graph_id
+        self.client = ChatClient() if client is None else client
+        self.query_timeout = query_timeout
+        self.max_results = max_results
+        self.query_workers = query_workers
+        self.labels = LabelIndex(graph) if graph is not None and label_index else None
+        self.context_path = context_path
+        self.tracer = Tracer() if tracer is None else tracer
+        self._context = None
+
+        self._import_pickles(legacy_query_cache_path, legacy_answer_cache_path)
+
+    def _import_pickles(self, query_cache_path: str, answer_cache_path: str):
+        imports = Store(self.query_cache_path, table = 'imports')
+
+        if (n_queries := import_pickle(query_cache_path, imports, self.query_cache.put_many)) > 0:
+            print(f'Imported {n_queries} cached queries from {query_cache_path}')
+
+        def put_answers(answers: dict):
+            results = {}
+
+            for question, answer_results in answers.items():
+                if (entry := self.query_cache.get(question)) is not None:
+                    results[self._extract_query(entry[0])] = answer_results
+
+            self.answer_cache.put_many(results, self._graph_id())
+
+        if (n_answers := import_pickle(answer_cache_path, imports, put_answers)) > 0:
+            print(f'Imported {n_answers} cached answers from {answer_cache_path}')
+
+    def get_context(self, fresh: bool = False):
+        """
+        Return context which is shared between questions, it is rebuilt only if fresh is requested or the cache file has changed
+        """
+
+        if fresh or self._context is None or self._context.stale:
+            with self.tracer.span('context', fresh = fresh):
+                if self._context is not None:
+                    self._context.close()
+
+                self._context = OrkgContext(
+                    self.context_path, fresh = fresh, graph = self.graph, query_timeout = self.query_timeout, max_results = self.max_results, labels = self.labels,
+                    query_workers = self.query_workers
+                )
+
+        return self._context
 
     def _extract_query(self, answer: str):
-        parts = answer.replace('```sparql', '```').split('```')
+        return extract_query(answer)
 
-        if len(parts) != 3:
-            return answer
-            # raise ValueError(f'Can\'t extract query from answer "{answer}"')
+    def _graph_id(self):
+        if self.graph is None:
+            return OrkgContext.root.format(path = 'triplestore')
 
-        return parts[1]
+        # results of the local graph are cut to max_results, so they are complete only for the same budget
 
-    def _execute(self, question: str, answer: str, context: OrkgContext):
-        query = self._extract_query(answer)
+        return self.graph_id if self.max_results is None else f'{self.graph_id}:max-results={self.max_results}'
 
-        answer_cache = self.answer_cache
+    def _execute(self, question: str, answer: str, context: OrkgContext):
+        with self.tracer.span('execute'):
+            query = self._extract_query(answer)
 
-        cached_results = None if answer_cache is None else answer_cache.get(question)
+            graph_id = self._graph_id()
 
-        if cached_results is not None:
-            return query, cached_results
+            with self.tracer.span('result_cache') as span:
+                cached_results = self.answer_cache.get(query, graph_id)
+                span['hit'] = cached_results is not None
 
-        results = context.get_triples(query)
+            if cached_results is not None:
+                return query, cached_results
 
-        print(results)
+            with self.tracer.span('graph') as span:
+                results = context.get_triples(query)
+                span['timed_out'] = results is None
 
-        if answer_cache is None:
-            answer_cache = {question: results}
-            self.answer_cache = answer_cache
-        else:
-            answer_cache[question] = results
+            if results is None:  # timed out and crashed queries are not cached, so they can be retried
+                print('Query timed out or crashed')
+                return query, None
 
-        dump_cache(self.answer_cache_path, answer_cache)
+            print(results)
 
-        return query, results
+            self.answer_cache.put(query, graph_id, results)
 
-    def ask(self, question: str, fresh: bool = False, dry_run: bool = False):
-        query_cache = self.query_cache
+            return query, results
 
-        context = OrkgContext(fresh = fresh, graph = self.graph)
+    def cached(self, question: str):
+        """
+        Return previously generated answer to the question or None if the question has not been asked yet
+        """
 
-        if query_cache is not None and not dry_run:
-            answer = query_cache.get(question)
+        with self.tracer.span('query_cache') as span:
+            entry = self.query_cache.get(question)
+            span['hit'] = entry is not None
 
-            if answer is not None:
-                return self._execute(question, answer, context)
+        return None if entry is None else entry[0]
 
+    def prompt(self, question: str, context: OrkgContext, examples: list = None):
         # examples, graph = context.cut(question)
-        examples, _ = context.cut(question)
+        with self.tracer.span('rank_cut' if examples is None else 'cut'):  # without examples they are ranked while cutting the context, the rank span is ranking only
+            examples, _ = context.cut(question, examples = examples)
 
         string_examples = []
 
@@ -107,31 +190,29 @@ class Responder:
             string_examples.append(f'I know that for a similar question "{example.utterance}" the correct query is \n```\n{example.query}\n```.')
 
         # content = PROMPT.format(graph = graph, examples = NEW_LINE.join(string_examples))
-        content = PROMPT.format(examples = NEW_LINE.join(string_examples), question = question)
+        return PROMPT.format(examples = NEW_LINE.join(string_examples), question = question)
 
+    def generate(self, question: str, content: str, dry_run: bool = False):
         if dry_run:
             answer = content
         else:
-            completion = cc.create(
-                model = 'gpt-3.5-turbo',
-                messages = [
-                    {
-                        'role': 'user',
-                        'content': content
-                    }
-                ]
-            )
-
-            sleep(20)
-
-            answer = completion.choices[0].message.content
-
-        if query_cache is None:
-            query_cache = {question: answer}
-            self.query_cache = query_cache
-        else:
-            query_cache[question] = answer
+            with self.tracer.span('llm'):  # includes waiting for the rate limits
+                answer = self.client.complete(content)
+
+        self.query_cache.put(question, answer)
+
+        return answer
+
+    def execute(self, question: str, answer: str, context: OrkgContext = None):
+        return self._execute(question, answer, self.get_context() if context is None else context)
+
+    def ask(self, question: str, fresh: bool = False, dry_run: bool = False, examples: list = None):
+        with self.tracer.span('ask'):
+            context = self.get_context(fresh = fresh)
+
+            if not dry_run and (answer := self.cached(question)) is not None:
+                return self._execute(question, answer, context)
 
-        dump_cache(self.query_cache_path, query_cache)
+            answer = self.generate(question, self.prompt(question, context, examples), dry_run)
 
-        return self._execute(question, answer, context)
+            return self._execute(question, answer, context)
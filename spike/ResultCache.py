@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import sha256
+from threading import Lock
+from time import time
+
+from .Store import Store
+from .util import normalize_query
+
+
+MAX_SIZE = 1024  # number of results which are kept in memory
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self):
+        return self.hits / n_lookups if (n_lookups := self.hits + self.misses) > 0 else 0.0
+
+    def __str__(self):
+        return f'{self.hits} hits ({self.memory_hits} in memory, {self.disk_hits} on disk), {self.misses} misses, hit rate {self.hit_rate:.2%}'
+
+
+class ResultCache:
+    """
+    Results of sparql queries keyed by normalized query text and identity of the graph against which the query was executed.
+
+    Recently used results are kept in memory with lru eviction, all results are persisted in a sqlite store (if path is given)
+    """
+
+    def __init__(self, cache_path: str = None, max_size: int = MAX_SIZE, ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.store = None if cache_path is None else Store(cache_path, table = 'results')
+        self.stats = CacheStats()
+
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(query: str, graph_id: str):
+        return sha256(f'{graph_id}\n{normalize_query(query)}'.encode('utf-8')).hexdigest()
+
+    def _expired(self, created: float):
+        return self.ttl is not None and time() - created > self.ttl
+
+    def _remember(self, key: str, value, created: float):
+        entries = self._entries
+
+        entries[key] = (value, created)
+        entries.move_to_end(key)
+
+        while len(entries) > self.max_size:
+            entries.popitem(last = False)
+
+    def get(self, query: str, graph_id: str):
+        key = self.key(query, graph_id)
+
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.stats.memory_hits += 1
+
+                    return entry[0]
+
+                del self._entries[key]
+
+            if self.store is not None and (entry := self.store.get(key)) is not None and not self._expired(entry[1]):
+                self._remember(key, *entry)
+                self.stats.disk_hits += 1
+
+                return entry[0]
+
+            self.stats.misses += 1
+
+        return None
+
+    def put_many(self, items: dict, graph_id: str):
+        """
+        Put results of many queries at once, items map queries to results
+        """
+
+        if self.store is not None:
+            self.store.put_many({self.key(query, graph_id): value for query, value in items.items()})
+
+        created = time()
+
+        with self._lock:
+            for query, value in items.items():
+                self._remember(self.key(query, graph_id), value, created)
+
+    def put(self, query: str, graph_id: str, value):
+        key = self.key(query, graph_id)
+        created = time()
+
+        with self._lock:
+            self._remember(key, value, created)
+
+        if self.store is not None:
+            self.store.put(key, value, created)
@@ -1,8 +1,11 @@
 from dataclasses import dataclass
 from urllib.request import urlretrieve
 from zipfile import ZipFile
-from os import path
-from .util import read_json
+from os import path, replace
+from pickle import load, dump, HIGHEST_PROTOCOL
+from sys import intern
+from .util import read_json, checksum
+from .similarity import Index
 
 URL = 'https://zenodo.org/record/7744048/files/SciQA-dataset.zip'
 ARCHIVE_PATH = path.join('assets', 'sciqa.zip')
@@ -11,28 +14,89 @@ DATA_PATH_PARENT = 'assets'
 DATA_PATH = path.join('assets', 'SciQA-dataset')
 
 
-@dataclass
+@dataclass(slots = True)
 class Entry:
     utterance: str
     query: str
 
 
+def _sibling(data_path: str, extension: str):
+    return f'{path.splitext(data_path)[0]}{extension}'
+
+
+def _read_snapshot(snapshot_path: str, data_checksum: str):
+    if path.isfile(snapshot_path):
+        with open(snapshot_path, 'rb') as file:
+            snapshot_checksum, utterances, queries = load(file)
+
+        if snapshot_checksum == data_checksum:
+            return utterances, queries
+
+    return None
+
+
+def _write_snapshot(snapshot_path: str, data_checksum: str, utterances: [str], queries: [str]):
+    tmp_path = f'{snapshot_path}.tmp'
+
+    with open(tmp_path, 'wb') as file:
+        dump((data_checksum, utterances, queries), file, protocol = HIGHEST_PROTOCOL)
+
+    replace(tmp_path, snapshot_path)
+
+
 class Subset:
+    """
+    Questions and queries of one SciQA split, stored as parallel lists of interned strings.
+
+    Parsed content is saved to a binary snapshot next to the source file, which is reused until checksum of the source changes
+    """
+
     def __init__(self, path: str):
+        self.path = path
+        self.checksum = checksum(path)
+        self._index = None
+
+        snapshot_path = _sibling(path, '.pkl')
+
+        if (snapshot := _read_snapshot(snapshot_path, self.checksum)) is None:
+            items = read_json(path)['questions']
+
+            snapshot = (
+                [intern(item['question']['string']) for item in items],
+                [intern(item['query']['sparql']) for item in items]
+            )
+
+            _write_snapshot(snapshot_path, self.checksum, *snapshot)
+
+        self.utterances, self.queries = snapshot
+
         self.entries = [
             Entry(
-                utterance = item['question']['string'],
-                query = item['query']['sparql']
+                utterance = utterance,
+                query = query
             )
-            for item in read_json(path)['questions']
+            for utterance, query in zip(self.utterances, self.queries)
         ]
 
+    def sibling(self, extension: str):
+        return _sibling(self.path, extension)
+
     @property
-    def utterances(self):
-        return [
-            entry.utterance
-            for entry in self.entries
-        ]
+    def index(self):
+        if self._index is None:
+            self._index = Index.load(self.sibling('.index.pkl'), lambda: self.utterances, self.checksum)
+
+        return self._index
+
+
+_subsets = {}  # subsets are loaded once per process
+
+
+def _load_subset(subset_path: str):
+    if (subset := _subsets.get(subset_path)) is None:
+        subset = _subsets[subset_path] = Subset(subset_path)
+
+    return subset
 
 
 class SciQA:
@@ -48,12 +112,12 @@ class SciQA:
 
     @property
     def train(self):
-        return Subset(path.join(DATA_PATH, 'train', 'questions.json'))
+        return _load_subset(path.join(DATA_PATH, 'train', 'questions.json'))
 
     @property
     def test(self):
-        return Subset(path.join(DATA_PATH, 'test', 'questions.json'))
+        return _load_subset(path.join(DATA_PATH, 'test', 'questions.json'))
 
     @property
     def valid(self):
-        return Subset(path.join(DATA_PATH, 'valid', 'questions.json'))
+        return _load_subset(path.join(DATA_PATH, 'valid', 'questions.json'))
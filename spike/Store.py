@@ -0,0 +1,100 @@
+import sqlite3
+from json import dumps, loads
+from threading import Lock
+from time import time
+
+
+BATCH_SIZE = 512  # max number of keys in one select statement
+
+
+def _dumps(value):
+    return dumps(value, ensure_ascii = False)
+
+
+class Store:
+    """
+    Durable key-value table in a sqlite database.
+
+    Every put is a small atomic transaction, and the database runs in write-ahead-log mode, so that many processes can read it while one of them writes.
+    Values are serialized as json unless other encode and decode functions are given, e.g. for storing raw bytes
+    """
+
+    def __init__(self, store_path: str = None, table: str = 'entries', encode: callable = _dumps, decode: callable = loads):
+        self.path = store_path
+        self.table = table
+        self.encode = encode
+        self.decode = decode
+
+        self._lock = Lock()
+        self._connection = connection = sqlite3.connect(
+            ':memory:' if store_path is None else store_path, timeout = 60, check_same_thread = False, isolation_level = None
+        )
+
+        connection.execute('pragma journal_mode = wal')
+        connection.execute('pragma synchronous = normal')
+        connection.execute(f'create table if not exists {table} (key text primary key, value text not null, created real not null)')
+
+    def get(self, key: str):
+        """
+        Return pair (value, creation timestamp) or None if there is no such key
+        """
+
+        with self._lock:
+            row = self._connection.execute(f'select value, created from {self.table} where key = ?', (key, )).fetchone()
+
+        if row is None:
+            return None
+
+        return self.decode(row[0]), row[1]
+
+    def get_many(self, keys: [str]):
+        """
+        Return dict which maps keys to pairs (value, creation timestamp), missing keys are skipped
+        """
+
+        found = {}
+
+        with self._lock:
+            for i in range(0, len(keys), BATCH_SIZE):
+                batch = keys[i:i + BATCH_SIZE]
+
+                for key, value, created in self._connection.execute(
+                    f'select key, value, created from {self.table} where key in ({", ".join("?" * len(batch))})', batch
+                ):
+                    found[key] = (self.decode(value), created)
+
+        return found
+
+    def put(self, key: str, value, created: float = None):
+        with self._lock:
+            self._connection.execute(
+                f'insert or replace into {self.table} (key, value, created) values (?, ?, ?)',
+                (key, self.encode(value), time() if created is None else created)
+            )
+
+    def put_many(self, items: dict, created: float = None):
+        created = time() if created is None else created
+
+        with self._lock:
+            with self._connection:
+                self._connection.execute('begin')
+                self._connection.executemany(
+                    f'insert or replace into {self.table} (key, value, created) values (?, ?, ?)',
+                    ((key, self.encode(value), created) for key, value in items.items())
+                )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute(f'delete from {self.table} where key = ?', (key, ))
+
+    def __contains__(self, key: str):
+        with self._lock:
+            return self._connection.execute(f'select 1 from {self.table} where key = ?', (key, )).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(f'select count(*) from {self.table}').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,139 @@
+from cProfile import Profile
+from contextlib import contextmanager
+from json import dumps
+from pstats import Stats
+from threading import Lock, current_thread, local
+from time import perf_counter, time
+
+from .util import summarize
+
+
+class Tracer:
+    """
+    Records timing spans of named stages and aggregates them into a per-run summary.
+
+    Spans may carry attributes, boolean attribute hit marks cache lookups, which are summarized as hit rates.
+    If spans path is given, every span is appended to the file as a json line when it ends.
+    If profile path is given, code which runs under profiling() is profiled with cProfile separately in every thread, and the stats are merged on close
+    """
+
+    def __init__(self, spans_path: str = None, profile_path: str = None):
+        self.spans_path = spans_path
+        self.profile_path = profile_path
+
+        self.durations = {}
+        self.hits = {}  # stage name -> [hits, lookups]
+
+        self._lock = Lock()
+        self._file = None if spans_path is None else open(spans_path, 'a', encoding = 'utf-8')
+
+        self._local = local()
+        self._profiles = []
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Measure duration of the block, the yielded dict of attributes can be updated inside the block
+        """
+
+        start = time()
+        counter = perf_counter()
+
+        try:
+            yield attributes
+        finally:
+            self.add(name, perf_counter() - counter, start, attributes)
+
+    def add(self, name: str, duration: float, start: float = None, attributes: dict = None):
+        attributes = attributes or {}
+
+        with self._lock:
+            self.durations.setdefault(name, []).append(duration)
+
+            if (hit := attributes.get('hit')) is not None:
+                counts = self.hits.setdefault(name, [0, 0])
+                counts[0] += bool(hit)
+                counts[1] += 1
+
+            if self._file is not None:
+                self._file.write(
+                    dumps(
+                        {'name': name, 'start': time() - duration if start is None else start, 'duration': duration, 'thread': current_thread().name, **attributes},
+                        ensure_ascii = False, default = str
+                    ) + '\n'
+                )
+
+    @contextmanager
+    def profiling(self):
+        """
+        Profile the block with cProfile if profile path is given, nested blocks in the same thread share one profile
+        """
+
+        if self.profile_path is None:
+            yield
+            return
+
+        if (profile := getattr(self._local, 'profile', None)) is None:
+            profile = self._local.profile = Profile()
+            self._local.depth = 0
+
+            with self._lock:
+                self._profiles.append(profile)
+
+        if self._local.depth == 0:
+            profile.enable()
+
+        self._local.depth += 1
+
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+
+            if self._local.depth == 0:
+                profile.disable()
+
+    def profiled(self, function: callable):
+        def wrapper(*args, **kwargs):
+            with self.profiling():
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    def summary(self):
+        """
+        Return dict which maps stage names to count, total and percentiles of durations, and hit rate for cache lookups
+        """
+
+        with self._lock:
+            return {
+                name: {
+                    **summarize(durations),
+                    **({} if (counts := self.hits.get(name)) is None else {'hits': counts[0], 'hit_rate': counts[0] / counts[1]})
+                }
+                for name, durations in self.durations.items()
+            }
+
+    def report(self):
+        lines = [f'{"stage":<16} {"count":>7} {"total, s":>10} {"p50, ms":>10} {"p95, ms":>10} {"hit rate":>9}']
+
+        for name, stats in self.summary().items():
+            hit_rate = f'{stats["hit_rate"]:.2%}' if 'hit_rate' in stats else '-'
+            lines.append(f'{name:<16} {stats["n"]:>7} {stats["total"]:>10.3f} {stats["p50"] * 1000:>10.2f} {stats["p95"] * 1000:>10.2f} {hit_rate:>9}')
+
+        return '\n'.join(lines)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self.profile_path is not None and self._profiles:
+            Stats(*self._profiles).dump_stats(self.profile_path)
+            self._profiles = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
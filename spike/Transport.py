@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+
+CONNECT_TIMEOUT = 10  # seconds
+READ_TIMEOUT = 120  # seconds
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)  # default for endpoints which answer quickly
+
+
+@dataclass
+class EndpointStats:
+    n_requests: int = 0
+    n_errors: int = 0
+    n_retries: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    @property
+    def mean_latency(self):
+        return self.total_latency / self.n_requests if self.n_requests > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f'{self.n_requests} requests, {self.n_errors} errors, {self.n_retries} retries, '
+            f'latency: mean {self.mean_latency:.3f} s, max {self.max_latency:.3f} s'
+        )
+
+
+class Transport:
+    """
+    Http client which keeps connections alive between requests and retries failed requests with jittered exponential backoff
+    """
+
+    _shared = None
+    _shared_lock = Lock()
+
+    def __init__(
+        self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT, max_retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0,
+        pool_size: int = 16, retry_statuses: tuple = RETRY_STATUSES
+    ):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = retry_statuses
+
+        self.session = session = Session()
+
+        adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        self.stats = {}
+        self._lock = Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        Return transport which is shared by all components in the process
+        """
+
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+
+        return cls._shared
+
+    def _record(self, url: str, latency: float = None, error: bool = False, retry: bool = False):
+        with self._lock:
+            if (stats := self.stats.get(url)) is None:
+                stats = self.stats[url] = EndpointStats()
+
+            stats.n_requests += 1
+
+            if latency is not None:
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+
+            if error:
+                stats.n_errors += 1
+
+            if retry:
+                stats.n_retries += 1
+
+    def _delay(self, attempt: int, retry_after: str = None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+
+        return uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _retry(self, attempt: int, delay: float, stop: float = None):
+        return attempt < self.max_retries and (stop is None or monotonic() + delay < stop)
+
+    def get(
+        self, url: str, params: dict = None, headers: dict = None, read_timeout: float = None, stream: bool = False, deadline: float = None,
+        retry_statuses: tuple = None
+    ):
+        """
+        Send GET request, connection errors and responses with retryable statuses are retried up to max_retries times.
+        Callers whose requests run for a long time may pass a narrower set of retryable statuses, since repeating such requests is expensive.
+
+        Read timeouts are not retried since they usually mean that the server is busy evaluating the request.
+        If deadline (in seconds) is given, it bounds all attempts together with pauses between them, and no attempt is made which can't complete in time
+        """
+
+        read_timeout = self.read_timeout if read_timeout is None else read_timeout
+        retry_statuses = self.retry_statuses if retry_statuses is None else retry_statuses
+        stop = None if deadline is None else monotonic() + deadline
+
+        attempt = 0
+
+        while True:
+            start = monotonic()
+
+            if stop is None:
+                timeout = (self.connect_timeout, read_timeout)
+            elif (remaining := stop - start) > 0:
+                timeout = (min(self.connect_timeout, remaining), min(read_timeout, remaining))
+            else:
+                raise Timeout(f'Deadline of {deadline} s has run out before the request to {url} could be sent')
+
+            try:
+                response = self.session.get(url, params = params, headers = headers, timeout = timeout, stream = stream)
+            except RequestsConnectionError:
+                delay = self._delay(attempt)
+                retry = self._retry(attempt, delay, stop)
+
+                self._record(url, monotonic() - start, error = True, retry = retry)
+
+                if not retry:
+                    raise
+
+                sleep(delay)
+                attempt += 1
+                continue
+            except Timeout:
+                self._record(url, monotonic() - start, error = True)
+                raise
+
+            latency = monotonic() - start
+
+            if response.status_code in retry_statuses:
+                delay = self._delay(attempt, response.headers.get('Retry-After'))
+                retry = self._retry(attempt, delay, stop)
+
+                self._record(url, latency, error = True, retry = retry)
+
+                if not retry:
+                    return response
+
+                response.close()
+
+                sleep(delay)
+                attempt += 1
+                continue
+
+            self._record(url, latency, error = response.status_code >= 400)
+
+            return response
@@ -0,0 +1,33 @@
+from typing import Callable, List
+
+from llama_index import QueryBundle
+from llama_index.indices.base_retriever import BaseRetriever
+from llama_index.schema import NodeWithScore, TextNode
+
+from .VectorStore import VectorStore
+
+
+TOP_K = 2  # the same as the default of llama_index vector index retriever
+
+
+class VectorRetriever(BaseRetriever):
+    """
+    Retriever of text nodes from the vector store, which can be passed to llama_index query engines
+    """
+
+    def __init__(self, store: VectorStore, embed: Callable[[str], list], top_k: int = TOP_K, n_probe: int = None):
+        self.store = store
+        self.embed = embed
+        self.top_k = top_k
+        self.n_probe = n_probe
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        embedding = self.embed(query_bundle.query_str) if query_bundle.embedding is None else query_bundle.embedding
+
+        rows, scores = self.store.search([embedding], self.top_k, self.n_probe)
+
+        return [
+            NodeWithScore(node = TextNode(id_ = self.store.id(row), text = self.store.text(row)), score = float(score))
+            for row, score in zip(rows[0].tolist(), scores[0].tolist())
+            if row >= 0
+        ]
@@ -0,0 +1,290 @@
+from json import dump, load
+from os import path, makedirs, replace
+from shutil import rmtree
+
+import numpy as np
+
+
+BLOCK_SIZE = 1 << 16  # number of rows which are multiplied by the queries at once
+
+N_ITERATIONS = 16  # k-means iterations for training the coarse quantizer
+SAMPLE_SIZE = 1 << 16  # max number of vectors which are used for training the coarse quantizer
+
+DTYPES = ('float32', 'float16')
+
+
+def _normalize(vectors: np.ndarray):
+    norms = np.linalg.norm(vectors, axis = -1, keepdims = True)
+
+    return vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def _top_k(scores: np.ndarray, top_k: int):
+    """
+    Return indices of the top_k largest scores in each row ordered by decreasing score
+    """
+
+    if top_k < scores.shape[1]:
+        indices = np.argpartition(-scores, top_k - 1, axis = 1)[:, :top_k]
+    else:
+        indices = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    order = np.argsort(-np.take_along_axis(scores, indices, axis = 1), axis = 1, kind = 'stable')
+
+    return np.take_along_axis(indices, order, axis = 1)
+
+
+class _Strings:
+    """
+    Strings which are written one by one into a single utf-8 file and are read back by index with offsets
+    """
+
+    def __init__(self, file_path: str):
+        self.file = open(file_path, 'wb')
+        self.offsets = [0]
+
+    def write(self, string: str):
+        blob = string.encode('utf-8')
+
+        self.file.write(blob)
+        self.offsets.append(self.offsets[-1] + len(blob))
+
+    def close(self, offsets_path: str):
+        self.file.close()
+        np.save(offsets_path, np.array(self.offsets, dtype = np.int64))
+
+
+class VectorStoreWriter:
+    """
+    Appends normalized embeddings with their ids and texts to a new store, which replaces the old one at the given path only after the writer has been closed
+    """
+
+    def __init__(self, store_path: str, dtype: str = 'float32'):
+        if dtype not in DTYPES:
+            raise ValueError(f'Unsupported dtype {dtype}, expected one of {DTYPES}')
+
+        if path.exists(store_path) and not VectorStore.exists(store_path):  # e.g. an index persisted by llama_index
+            raise FileExistsError(f'{store_path} exists and is not a vector store, refusing to replace it')
+
+        self.store_path = store_path
+        self.dtype = dtype
+
+        self.tmp_path = tmp_path = f'{store_path}.tmp'
+
+        if path.isdir(tmp_path):
+            rmtree(tmp_path)
+
+        makedirs(tmp_path)
+
+        self._vectors = open(path.join(tmp_path, 'vectors.bin'), 'wb')
+        self._ids = _Strings(path.join(tmp_path, 'ids.bin'))
+        self._texts = _Strings(path.join(tmp_path, 'texts.bin'))
+
+        self.length = 0
+        self.dim = None
+
+    def add(self, ids: [str], texts: [str], vectors):
+        if len(ids) < 1:
+            return
+
+        vectors = np.asarray(vectors, dtype = np.float32).reshape(len(ids), -1)
+
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f'Expected vectors with {self.dim} dimensions, got {vectors.shape[1]}')
+
+        self._vectors.write(_normalize(vectors).astype(self.dtype).tobytes())
+
+        for id_, text in zip(ids, texts):
+            self._ids.write(id_)
+            self._texts.write(text)
+
+        self.length += len(ids)
+
+    def close(self):
+        self._vectors.close()
+        self._ids.close(path.join(self.tmp_path, 'ids.npy'))
+        self._texts.close(path.join(self.tmp_path, 'texts.npy'))
+
+        with open(path.join(self.tmp_path, 'meta.json'), 'w', encoding = 'utf-8') as file:
+            dump({'length': self.length, 'dim': self.dim or 0, 'dtype': self.dtype}, file)
+
+        if path.isdir(self.store_path):
+            rmtree(self.store_path)
+
+        replace(self.tmp_path, self.store_path)
+
+    def abort(self):
+        """
+        Drop everything written so far, the existing store is kept
+        """
+
+        self._vectors.close()
+        self._ids.file.close()
+        self._texts.file.close()
+
+        rmtree(self.tmp_path, ignore_errors = True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class VectorStore:
+    """
+    Read-only store of normalized embeddings in a memory-mapped matrix with parallel tables of ids and texts.
+
+    Exact search multiplies queries by blocks of the matrix and keeps the running top k, so that scores for all rows are never materialized at once.
+    Optionally vectors are grouped by the nearest centroid of a coarse quantizer (inverted file), and only lists of the n_probe nearest centroids are scanned
+    """
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+
+        with open(path.join(store_path, 'meta.json'), 'r', encoding = 'utf-8') as file:
+            self.meta = meta = load(file)
+
+        self.length = length = meta['length']
+        self.dim = dim = meta['dim']
+
+        self.vectors = (
+            np.memmap(path.join(store_path, 'vectors.bin'), dtype = meta['dtype'], mode = 'r', shape = (length, dim))
+            if length > 0 else np.empty((0, dim), dtype = meta['dtype'])
+        )
+
+        self._ids = self._strings('ids')
+        self._texts = self._strings('texts')
+
+        if path.isfile(ivf_path := path.join(store_path, 'centroids.npy')):
+            self.centroids = np.load(ivf_path)
+            self.order = np.load(path.join(store_path, 'order.npy'), mmap_mode = 'r')
+            self.list_offsets = np.load(path.join(store_path, 'list_offsets.npy'))
+        else:
+            self.centroids = self.order = self.list_offsets = None
+
+    @staticmethod
+    def exists(store_path: str):
+        return path.isfile(path.join(store_path, 'meta.json'))
+
+    def _strings(self, name: str):
+        offsets = np.load(path.join(self.store_path, f'{name}.npy'))
+        blob = np.memmap(path.join(self.store_path, f'{name}.bin'), dtype = np.uint8, mode = 'r') if offsets[-1] > 0 else np.empty(0, dtype = np.uint8)
+
+        return blob, offsets
+
+    @staticmethod
+    def _string(strings, i: int):
+        blob, offsets = strings
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+
+    def __len__(self):
+        return self.length
+
+    def id(self, i: int):
+        return self._string(self._ids, i)
+
+    def text(self, i: int):
+        return self._string(self._texts, i)
+
+    def _queries(self, queries):
+        return _normalize(np.asarray(queries, dtype = np.float32).reshape(-1, self.dim))
+
+    def _scan(self, queries: np.ndarray, rows: np.ndarray, top_k: int):
+        """
+        Return pair of arrays (row numbers, scores) with top_k rows for each query, rows are either a slice of the matrix or an array of row numbers
+        """
+
+        best_rows = np.empty((len(queries), 0), dtype = np.int64)
+        best_scores = np.empty((len(queries), 0), dtype = np.float32)
+
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+
+            if isinstance(block, range):  # contiguous rows are sliced without copying
+                vectors = self.vectors[block.start:block.stop]
+                block = np.arange(block.start, block.stop)
+            else:
+                vectors = self.vectors[block]
+
+            scores = np.concatenate((best_scores, queries @ np.asarray(vectors, dtype = np.float32).T), axis = 1)
+            candidates = np.concatenate((best_rows, np.broadcast_to(block, (len(queries), len(block)))), axis = 1)
+
+            indices = _top_k(scores, top_k)
+
+            best_rows = np.take_along_axis(candidates, indices, axis = 1)
+            best_scores = np.take_along_axis(scores, indices, axis = 1)
+
+        return best_rows, best_scores
+
+    def search(self, queries, top_k: int = 2, n_probe: int = None):
+        """
+        Return pair of arrays (row numbers, cosine similarities) with shape (number of queries, top_k) ordered by decreasing similarity.
+
+        If the store has an inverted file and n_probe is given, only vectors from n_probe lists with the nearest centroids are compared with queries
+        """
+
+        queries = self._queries(queries)
+        top_k = min(top_k, self.length)
+
+        if n_probe is None or self.centroids is None:
+            return self._scan(queries, range(self.length), top_k)
+
+        lists = _top_k(queries @ self.centroids.T, min(n_probe, len(self.centroids)))
+
+        rows = []
+        scores = []
+
+        for query, query_lists in zip(queries, lists):  # every query has its own set of candidates
+            candidates = np.concatenate([self.order[self.list_offsets[i]:self.list_offsets[i + 1]] for i in query_lists])
+            query_rows, query_scores = self._scan(query[None], candidates, min(top_k, len(candidates)))
+
+            rows.append(np.pad(query_rows[0], (0, top_k - query_rows.shape[1]), constant_values = -1))
+            scores.append(np.pad(query_scores[0], (0, top_k - query_scores.shape[1]), constant_values = -np.inf))
+
+        return np.array(rows, dtype = np.int64).reshape(-1, top_k), np.array(scores, dtype = np.float32).reshape(-1, top_k)
+
+    def build_ivf(self, n_lists: int, n_iterations: int = N_ITERATIONS, sample_size: int = SAMPLE_SIZE, seed: int = 0):
+        """
+        Train the coarse quantizer with spherical k-means on a sample of vectors and write row numbers grouped by the nearest centroid
+        """
+
+        n_lists = min(n_lists, self.length)
+        random = np.random.default_rng(seed)
+
+        sample = np.asarray(self.vectors[np.sort(random.choice(self.length, min(sample_size, self.length), replace = False))], dtype = np.float32)
+        centroids = sample[random.choice(len(sample), n_lists, replace = False)]
+
+        for _ in range(n_iterations):
+            assignment = np.argmax(sample @ centroids.T, axis = 1)
+
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+
+            empty = ~sums.any(axis = 1)  # centroids without vectors are kept in place
+            sums[empty] = centroids[empty]
+
+            centroids = _normalize(sums)
+
+        assignment = np.empty(self.length, dtype = np.int64)
+
+        for start in range(0, self.length, BLOCK_SIZE):
+            assignment[start:start + BLOCK_SIZE] = np.argmax(np.asarray(self.vectors[start:start + BLOCK_SIZE], dtype = np.float32) @ centroids.T, axis = 1)
+
+        order = np.argsort(assignment, kind = 'stable')
+
+        list_offsets = np.zeros(n_lists + 1, dtype = np.int64)
+        list_offsets[1:] = np.cumsum(np.bincount(assignment, minlength = n_lists))
+
+        np.save(path.join(self.store_path, 'order.npy'), order)
+        np.save(path.join(self.store_path, 'list_offsets.npy'), list_offsets)
+        np.save(path.join(self.store_path, 'centroids.npy'), centroids.astype(np.float32))  # written last, because its presence marks the inverted file as complete
+
+        self.centroids = centroids.astype(np.float32)
+        self.order = np.load(path.join(self.store_path, 'order.npy'), mmap_mode = 'r')
+        self.list_offsets = list_offsets
@@ -1,33 +1,46 @@
-import re
 from os import path
+from itertools import islice
 from pickle import load as loadd, dump as dumpp
 
-from json import load, dump
+from json import load, dump, dumps
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from click import group, argument, option, Choice
 from rdflib import Graph
 from halo import Halo
-from transformers import AutoTokenizer, FalconModel
-from torch import mean
 from tqdm import tqdm
 
-from llama_index import GPTVectorStoreIndex, download_loader, StorageContext, load_index_from_storage, QueryBundle
+from llama_index import download_loader, QueryBundle
+from llama_index.query_engine import RetrieverQueryEngine
 
 # from openai import ChatCompletion as cc
 
 # from .OrkgContext import OrkgContext
-from .similarity import compare as compare_strings, rank
+from .similarity import compare as compare_strings, rank_many, RankPool
 from .SciQA import SciQA
 from .Responder import Responder
 from .util import drop_spaces
 from .RDFReader import RDFReader
-from .QueryEngine import QueryEngine
+from .QueryEngine import QueryEngine, QueryError
+from .Checkpoint import Checkpoint
+from .Pipeline import Pipeline, Stage
+from .EncodedStore import EncodedStore
+from .NTriplesLoader import NTriplesLoader, is_ntriples
+from .LabelNormalizer import LabelNormalizer, BLOCK_SIZE
+from .ChatClient import ChatClient, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE
+from .OrkgContext import N_EXAMPLES
+from .QueryWorker import QUERY_TIMEOUT
+from .ResultCache import MAX_SIZE
+from .Embedder import Embedder, MAX_BATCH_TOKENS
+from .EmbeddingRetriever import EmbeddingRetriever
+from .VectorStore import VectorStore, VectorStoreWriter, DTYPES
+from .VectorRetriever import VectorRetriever, TOP_K
+from .Benchmark import Benchmark, BENCHMARKS, FIXTURE_PATH, ANSWERS_PATH
+from .Tracer import Tracer
 
 
 NEW_LINE = '\n'
 MARK = '-' * 10
 
-LABEL_LINE = re.compile(r'>(\s+)<\S+[A-Z]+[0-9]+>(\s+.+XMLSchema#string>)')
-
 
 @group()
 def main():
@@ -38,91 +51,219 @@ def main():
 @argument('question', type = str, default = None, required = False)
 @option('-d', '--dry-run', is_flag = True, help = 'Print generated context and exit')
 @option('-f', '--fresh', is_flag = True, help = 'Don\'t use cached context entries, generate them from scratch')
-@option('-c', '--cache-path', type = str, help = 'Path to the cached answers', default = 'assets/queries.pkl')
+@option('-c', '--cache-path', type = str, help = 'Path to sqlite database with cached answers', default = 'assets/queries.sqlite')
+@option('--legacy-cache-path', type = str, help = 'Path to the pickled answers, which are imported once into the database', default = 'assets/queries.pkl')
 @option('-q', '--questions-path', type = str, help = 'Path to the file with questions', default = None)
-@option('-g', '--graph-path', type = str, help = 'Path with .nt file with knowledge graph which should be used for generated query execution')
+@option('-g', '--graph-path', type = str, help = 'Path with .nt (or .nt.gz) file with knowledge graph which should be used for generated query execution')
 @option('--graph-cache', type = str, help = 'Path to the cached result of graph parsing', default = 'assets/orkg.pkl')
+@option('--graph-backend', help = 'How to keep the graph: as a pickled in-memory rdflib graph or as a memory-mapped dictionary-encoded store', type = Choice(('memory', 'encoded')), default = 'memory')
+@option('--graph-store', type = str, help = 'Path to the directory with dictionary-encoded graph, which is built on the first run', default = 'assets/orkg-store')
+@option('--query-timeout', type = float, help = 'Max number of seconds for executing one query against the local graph, 0 disables the limit', default = QUERY_TIMEOUT)
+@option('--max-results', type = int, help = 'Max number of result rows which are kept for one query against the local graph', default = None)
+@option('--no-label-index', is_flag = True, help = 'Don\'t use index of rdfs:label values for evaluating label filters of queries against the local graph')
+@option('--parse-workers', type = int, help = 'Number of processes for parsing n-triples graph (defaults to the number of cpus)', default = None)
 @option('-a', '--answers-path', type = str, help = 'Path to the output .json file with answers', default = 'assets/answers.json')
-@option('-z', '--answer-cache-path', type = str, help = 'Path to file which contains cached results of generated sparql queries execution', default = 'assets/answers.pkl')
-def ask(question: str, dry_run: bool, fresh: bool, cache_path: str, questions_path: str, graph_path: str, graph_cache: str, answers_path: str, answer_cache_path: str):
-    graph = None
+@option('-z', '--answer-cache-path', type = str, help = 'Path to sqlite database which contains cached results of generated sparql queries execution', default = 'assets/results.sqlite')
+@option('--answer-cache-size', type = int, help = 'Max number of query results which are kept in memory', default = MAX_SIZE)
+@option('--answer-cache-ttl', type = float, help = 'Number of seconds after which cached query results expire (by default they never do)', default = None)
+@option('--legacy-answer-cache-path', type = str, help = 'Path to the pickled results, which are imported once into the database', default = 'assets/answers.pkl')
+@option('-w', '--workers', type = int, help = 'Number of processes for ranking few-shot examples in batch mode (defaults to the number of cpus)', default = None)
+@option('-r', '--retriever', help = 'How to pick few-shot examples: by edit distance or by embedding similarity', type = Choice(('edit', 'embedding')), default = 'edit')
+@option('--device', help = 'Device which to use for embedding model execution', type = Choice(('cpu', 'cuda:0'), case_sensitive = True), default = 'cpu')
+@option('--requests-per-minute', type = float, help = 'Max number of requests to the llm per minute', default = REQUESTS_PER_MINUTE)
+@option('--tokens-per-minute', type = float, help = 'Max number of tokens sent to and received from the llm per minute', default = TOKENS_PER_MINUTE)
+@option('--llm-concurrency', type = int, help = 'Max number of requests to the llm which are executed at the same time', default = 4)
+@option('--execution-concurrency', type = int, help = 'Max number of generated queries which are executed at the same time in batch mode', default = 1)
+@option('--queue-size', type = int, help = 'Max number of questions waiting between stages in batch mode', default = 16)
+@option('--checkpoint-path', type = str, help = 'Path to the .jsonl file with already answered questions (defaults to the answers path with .jsonl extension)', default = None)
+@option('--profile', type = str, help = 'Path to the .jsonl file to which timing spans of every stage are appended', default = None)
+@option('--cprofile', is_flag = True, help = 'Also profile the run with cProfile, stats are written next to the profile file with .prof extension')
+def ask(
+    question: str, dry_run: bool, fresh: bool, cache_path: str, legacy_cache_path: str, questions_path: str, graph_path: str, graph_cache: str,
+    graph_backend: str, graph_store: str, query_timeout: float, max_results: int, no_label_index: bool, parse_workers: int, answers_path: str,
+    answer_cache_path: str, answer_cache_size: int, answer_cache_ttl: float, legacy_answer_cache_path: str, workers: int, retriever: str, device: str,
+    requests_per_minute: float, tokens_per_minute: float, llm_concurrency: int, execution_concurrency: int, queue_size: int, checkpoint_path: str,
+    profile: str, cprofile: bool
+):
+    if cprofile and profile is None:
+        raise ValueError('If cprofile is requested, then profile path must be given')
+
+    tracer = Tracer(profile, None if profile is None or not cprofile else f'{path.splitext(profile)[0]}.prof')
+
+    with tracer, tracer.profiling():
+        graph = None
+        graph_id = None
+
+        # Parse graph or load from cache
+
+        if graph_path is not None:
+            graph_id = f'{path.abspath(graph_path)}:{path.getmtime(graph_path)}:{path.getsize(graph_path)}' if path.isfile(graph_path) else path.abspath(graph_path)
+
+            with tracer.span('load_graph', backend = graph_backend) as span:
+                if graph_backend == 'encoded':
+                    graph = Graph(store = EncodedStore.load(graph_store, graph_path, workers = parse_workers))
+                elif path.isfile(graph_cache):
+                    span['cached'] = True
+
+                    with open(graph_cache, 'rb') as file:
+                        graph = loadd(file)
+                else:
+                    if is_ntriples(graph_path):
+                        loader = NTriplesLoader(parse_workers)
+                        graph = loader.load(graph_path)
+
+                        print(f'Parsed {loader.report()}')
+                    else:
+                        graph = Graph()
+
+                        print('parsing graph...')
+                        graph.parse(graph_path)
+
+                    with open(graph_cache, 'wb') as file:
+                        dumpp(graph, file)
+
+        # Run queries, send them to the parsed graph, get answers and write them to an external file
+
+        responder = Responder(
+            cache_path, answer_cache_path, graph = graph, graph_id = graph_id,
+            legacy_query_cache_path = legacy_cache_path, legacy_answer_cache_path = legacy_answer_cache_path,
+            client = ChatClient(requests_per_minute = requests_per_minute, tokens_per_minute = tokens_per_minute, max_concurrency = llm_concurrency),
+            query_timeout = query_timeout or None, max_results = max_results, label_index = not no_label_index, tracer = tracer,
+            query_workers = execution_concurrency, answer_cache_size = answer_cache_size, answer_cache_ttl = answer_cache_ttl
+        )
+
+        train = SciQA().train
+
+        embedding_retriever = EmbeddingRetriever(train, Embedder(device = device)) if retriever == 'embedding' else None
 
-    # Parse graph or load from cache
+        if questions_path is None:
+            if question is None:
+                raise ValueError('If questions-path is not provided, then question must be given as the first argument')
 
-    if graph_path is not None:
-        if path.isfile(graph_cache):
-            with open(graph_cache, 'rb') as file:
-                graph = loadd(file)
+            if embedding_retriever is None:
+                examples = None
+            else:
+                with tracer.span('rank'):
+                    examples = embedding_retriever.retrieve(question, N_EXAMPLES)
+
+            answer = responder.ask(question, fresh = fresh, dry_run = dry_run, examples = examples)
+            print(answer)
         else:
-            graph = Graph()
+            with open(questions_path, 'r', encoding = 'utf-8') as file:
+                content = load(file)
 
-            print('parsing graph...')
-            graph.parse(graph_path)
+            if checkpoint_path is None:
+                checkpoint_path = f'{path.splitext(answers_path)[0]}.jsonl'
 
-            with open(graph_cache, 'wb') as file:
-                dumpp(graph, file)
+            questions = []
 
-    # Run queries, send them to the parsed graph, get answers and write them to an external file
+            for entry in content:
+                try:
+                    questions.append(entry["question"]["string"])
+                except Exception:
+                    # print(e)
+                    questions.append(entry['question'])
 
-    responder = Responder(cache_path, answer_cache_path, graph = graph)
+            context = responder.get_context(fresh = fresh)
 
-    if questions_path is None:
-        if question is None:
-            raise ValueError('If questions-path is not provided, then question must be given as the first argument')
+            with Checkpoint(checkpoint_path) as checkpoint, RankPool(
+                train.entries, N_EXAMPLES, get_utterance = lambda entry: entry.utterance, index = train.index,
+                workers = 0 if embedding_retriever is not None else workers
+            ) as pool:
 
-        answer = responder.ask(question, fresh = fresh, dry_run = dry_run)
-        print(answer)
-    else:
-        with open(questions_path, 'r', encoding = 'utf-8') as file:
-            content = load(file)
+                # Every item is a list [position, question, prompt or None, answer or None, query, results] which is filled in by the stages
 
-        n_matched_queries = 0
-        n_queries = 0
+                def retrieve(item: list):
+                    if (answer := responder.cached(item[1])) is not None:
+                        item[3] = answer
+                    else:
+                        with tracer.span('rank'):
+                            examples = pool.rank(item[1]) if embedding_retriever is None else embedding_retriever.retrieve(item[1], N_EXAMPLES)
 
-        answers = []
+                        item[2] = responder.prompt(item[1], context, examples)
 
-        for i, entry in enumerate(content):
-            try:
-                question = entry["question"]["string"]
-            except Exception:
-                # print(e)
-                question = entry['question']
-
-            print(f'{i:03d}. {question}')
-
-            # if i in (26, 53):  # these queries take a lot of time to process
-            #     answers.append({
-            #         'id': entry['id'],
-            #         'answer': []
-            #     })
-            # else:
-            query, answer = responder.ask(question)
-
-            answers.append({
-                'id': entry['id'],
-                'answer': answer
-            })
-
-            if entry.get('query') is not None:
-                if drop_spaces(query) == drop_spaces(entry['query']['sparql']):
-                    n_matched_queries += 1
-                else:
-                    print(f'{MARK} Queries differ')
-                    print(f'{MARK} Generated:')
-                    print(query)
-                    print(f'{MARK} Reference:')
-                    print(entry['query']['sparql'])
-                    print(MARK)
+                    return item
 
-            # if len(answer) > 0:
-            #     print(answer)
+                def generate(item: list):
+                    if item[3] is None:
+                        item[3] = responder.generate(item[1], item[2])
 
-            n_queries += 1
+                    return item
 
-        print('question precision: ', n_matched_queries / n_queries)
+                def execute(item: list):
+                    item[4], item[5] = responder.execute(item[1], item[3], context)
 
-    with open(answers_path, 'w', encoding = 'utf-8') as file:
-        dump(answers, file, indent = 4)
+                    return item
+
+                pipeline = Pipeline(
+                    [
+                        Stage('retrieve', tracer.profiled(retrieve), 1 if embedding_retriever is not None else max(1, pool.workers)),
+                        Stage('generate', tracer.profiled(generate), llm_concurrency),
+                        Stage('execute', tracer.profiled(execute), execution_concurrency)
+                    ],
+                    queue_size = queue_size
+                )
+
+                items = [
+                    [i, question, None, None, None, None]
+                    for i, (entry, question) in enumerate(zip(content, questions))
+                    if checkpoint.get(entry['id'], {}).get('answer') is None  # timed out queries saved by previous versions are retried too
+                ]
+
+                if len(items) < len(content):
+                    print(f'Skipping {len(content) - len(items)} questions which have already been answered')
+
+                timed_out = {}  # timed out and crashed queries are not saved, so they are retried on the next run
+
+                for i, question, _, _, query, answer in pipeline.run(items):
+                    entry = content[i]
+
+                    print(f'{i:03d}. {question}')
+
+                    if answer is None:
+                        timed_out[entry['id']] = {'query': query, 'answer': None}
+                        print(f'{MARK} Query timed out or crashed')
+                    else:
+                        checkpoint.add(entry['id'], {'query': query, 'answer': answer})
+
+                    if entry.get('query') is not None and drop_spaces(query) != drop_spaces(entry['query']['sparql']):
+                        print(f'{MARK} Queries differ')
+                        print(f'{MARK} Generated:')
+                        print(query)
+                        print(f'{MARK} Reference:')
+                        print(entry['query']['sparql'])
+                        print(MARK)
+
+                n_matched_queries = 0
+                n_timed_out_queries = 0
+                n_queries = 0
+
+                answers = []
+
+                for entry in content:
+                    record = checkpoint.get(entry['id']) or timed_out[entry['id']]
+
+                    answers.append({
+                        'id': entry['id'],
+                        'answer': [] if record['answer'] is None else record['answer']
+                    })
+
+                    if record['answer'] is None:
+                        n_timed_out_queries += 1
+
+                    if entry.get('query') is not None and drop_spaces(record['query']) == drop_spaces(entry['query']['sparql']):
+                        n_matched_queries += 1
+
+                    n_queries += 1
+
+            print('question precision: ', n_matched_queries / n_queries)
+            print('timed out queries: ', n_timed_out_queries)
+            print('result cache: ', responder.answer_cache.stats)
+
+            with open(answers_path, 'w', encoding = 'utf-8') as file:
+                dump(answers, file, indent = 4)
+
+        print(tracer.report())
 
     # cache = None
 
@@ -200,16 +341,24 @@ def compare(lhs: str, rhs: str):
 
 @main.command()
 @option('-n', '--top-n', type = int, default = 3)
-def trace(top_n: int):
+@option('-s', '--n-samples', type = int, help = 'Number of test samples to trace', default = 1)
+@option('-w', '--workers', type = int, help = 'Number of processes for ranking train samples (defaults to the number of cpus)', default = None)
+@option('--chunk-size', type = int, help = 'Number of test samples which are sent to a ranking process at once', default = None)
+def trace(top_n: int, n_samples: int, workers: int, chunk_size: int):
     # print(rank('foo', ['qux', 'o', 'fo'], top_n = 2))
 
     sciqa = SciQA()
 
-    train_entries = sciqa.train.entries
+    train = sciqa.train
+    test_utterances = sciqa.test.utterances[:n_samples]
 
-    for test_utterance in sciqa.test.utterances[:1]:
+    similar_entries = rank_many(
+        test_utterances, train.entries, top_n, get_utterance = lambda entry: entry.utterance, index = train.index, workers = workers, chunk_size = chunk_size
+    )
+
+    for test_utterance, train_entries in zip(test_utterances, similar_entries):
         print(f'Test sample: {test_utterance}')
-        print(f'Similar train samples: {rank(test_utterance, train_entries, top_n, get_utterance = lambda entry: entry.utterance)}')
+        print(f'Similar train samples: {train_entries}')
         print('')
 
     # print(len(sciqa.train.utterances))
@@ -218,96 +367,64 @@ def trace(top_n: int):
 
 @main.command()
 @option('-g', '--graph-path', help = 'path to the .nt file with input graph which should be embedded', default = 'assets/cities.nt')
-@option('-c', '--cache-path', help = 'path to the resulting file with embedded graph', default = 'assets/cities')
+@option('-c', '--cache-path', help = 'path to the resulting directory with vector store of the embedded graph', default = 'assets/cities')
 @option('-d', '--device', help = 'device which to use for model execution', type = Choice(('cpu', 'cuda:0'), case_sensitive = True), default = 'cpu')
-@option('-b', '--batch-size', help = 'how many documents to computed embeddings for at once', default = 4)
-def embed(graph_path: str, cache_path: str, device: str, batch_size: int):
+@option('-b', '--batch-size', help = 'how many documents to pass to the embedder at once, which splits them into batches by the token budget', default = 256)
+@option('-s', '--stream', is_flag = True, help = 'embed documents and write them into the store as they are read, without keeping all of them in memory')
+@option('-e', '--embedding-cache-path', help = 'path to sqlite database with embeddings of already seen texts', default = 'assets/embeddings.sqlite')
+@option('--max-batch-tokens', type = int, help = 'max number of tokens in one padded batch which is passed to the model', default = MAX_BATCH_TOKENS)
+@option('-t', '--threads', type = int, help = 'number of threads which torch uses for model execution on cpu (defaults to the torch setting)', default = None)
+@option('--dtype', help = 'type of vectors in the store', type = Choice(DTYPES), default = 'float32')
+@option('--ivf-lists', type = int, help = 'number of lists in the inverted file for approximate search, 0 means exact search only', default = 0)
+@option('--n-probe', type = int, help = 'number of inverted file lists which are scanned for each query (defaults to exact search)', default = None)
+@option('-k', '--top-k', type = int, help = 'number of documents which are retrieved for a query', default = TOP_K)
+def embed(
+    graph_path: str, cache_path: str, device: str, batch_size: int, stream: bool, embedding_cache_path: str, max_batch_tokens: int, threads: int,
+    dtype: str, ivf_lists: int, n_probe: int, top_k: int
+):
     # RDFReader = download_loader('RDFReader')
-    tokenizer = AutoTokenizer.from_pretrained('Rocketknight1/falcon-rw-1b', device_map = device)
-    tokenizer.pad_token = tokenizer.eos_token
-
-    model = FalconModel.from_pretrained('Rocketknight1/falcon-rw-1b', device_map = device)
-    # model = FalconModel.from_pretrained('Rocketknight1/falcon-rw-1b')
-
-    def to_device(outputs: dict):
-        return {
-            'input_ids': outputs['input_ids'].to(device),
-            'attention_mask': outputs['attention_mask'].to(device)
-        }
-
-    def embed_one(text: str):
-        return mean(
-            model(
-                **to_device(
-                    tokenizer(text, return_tensors = 'pt')
-                )
-            ).last_hidden_state,
-            dim = (0, 1)
-        ).to('cpu').tolist()
+    embedder = Embedder(device = device, cache_path = embedding_cache_path, max_batch_tokens = max_batch_tokens, threads = threads)
 
     def embed_batch(batch: list):
-        texts = [document.text for document in batch]
-
-        inputs = tokenizer(texts, return_tensors = 'pt', padding = True)
-        outputs = model(**to_device(inputs))
-
-        for embedding, document in zip(mean(outputs.last_hidden_state, dim = 1).to('cpu').tolist(), batch):
+        for embedding, document in zip(embedder.embed([document.text for document in batch]), batch):
             document.embedding = embedding
 
-    if path.isdir(cache_path):
-        with Halo(text = 'Restoring index', spinner = 'dots'):
-            index = load_index_from_storage(StorageContext.from_defaults(persist_dir = cache_path))
-    else:
-        # with Halo(text = 'Loading graph', spinner = 'dots'):
-        documents = RDFReader().load_data(
-            file = graph_path,
-            max_document_size = 1,
-            embed = embed_batch,
-            batch_size = batch_size
-            # embed = embed_one
-        )
-
-        # print([document.text for document in documents])
-
-        # return
-
-        # batch = []
-
-        # print(documents[-2].embedding)
-
-        # for document in documents:
-        #     batch.append(document)
-
-        #     # inputs = tokenizer(document.text, return_tensors = 'pt')
-
-        #     # print(document.text)
-        #     # print(inputs)
-        #     # print(document.embedding)
-
-        #     # outputs = model(**inputs)
-
-        #     # print(outputs.last_hidden_state.shape)
-
-        # if len(batch) > 0:
-        #     embed_batch()
+    def write_batch(writer: VectorStoreWriter, batch: list):
+        writer.add([document.doc_id for document in batch], [document.text for document in batch], [document.embedding for document in batch])
+
+    if not VectorStore.exists(cache_path):
+        with VectorStoreWriter(cache_path, dtype) as writer:
+            if stream:
+                documents = RDFReader().iter_data(file = graph_path, max_document_size = 1)
+
+                while batch := list(islice(documents, batch_size)):
+                    embed_batch(batch)
+                    write_batch(writer, batch)
+            else:
+                documents = RDFReader().load_data(
+                    file = graph_path,
+                    max_document_size = 1,
+                    embed = embed_batch,
+                    batch_size = batch_size
+                    # embed = embed_one
+                )
 
-        # return
+                write_batch(writer, documents)
 
-        # print(mean(outputs.last_hidden_state, dim = (0, 1)).shape)
-        # print(len(mean(outputs.last_hidden_state, dim = (0, 1)).tolist()))
+        print(embedder.report())
 
-        # print(outputs.last_hidden_state)
+    store = VectorStore(cache_path)
 
-        # with Halo(text = 'Generating embeddings', spinner = 'dots'):
-        index = GPTVectorStoreIndex.from_documents(documents, show_progress = True)
-        index.storage_context.persist(persist_dir = cache_path)
+    if ivf_lists > 0 and (store.centroids is None or len(store.centroids) != ivf_lists):
+        with Halo(text = 'Building inverted file', spinner = 'dots'):
+            store.build_ivf(ivf_lists)
 
     query = 'List all places in a quoted Python array, then explain why'
 
-    response = index.as_query_engine().query(
+    response = RetrieverQueryEngine.from_args(VectorRetriever(store, embedder.embed_one, top_k, n_probe)).query(
         QueryBundle(
             query_str = query,
-            embedding = embed_one(query)
+            embedding = embedder.embed_one(query)
         )
     )
 
@@ -317,34 +434,29 @@ def embed(graph_path: str, cache_path: str, device: str, batch_size: int):
 
 @main.command()
 @argument('input-path')
-@option('-o', '--output-path', help = 'path to the output file', default = 'assets/labelled-corpus.nt')
-def normalize_labels(input_path: str, output_path: str):
-    with open(input_path, 'r', encoding = 'utf-8') as input_file:
-        with open(output_path, 'w', encoding = 'utf-8') as output_file:
-            while True:
-                line = input_file.readline()
-
-                if not line:
-                    break
-
-                line = line[:-1]
-
-                # print(line)
-                output_file.write(LABEL_LINE.sub(r'>\g<1><http://www.w3.org/2000/01/rdf-schema#label>\g<2>', line) + '\n')
+@option('-o', '--output-path', help = 'path to the output file (gzip-compressed if the name ends with .gz)', default = 'assets/labelled-corpus.nt')
+@option('-w', '--workers', type = int, help = 'number of processes which rewrite blocks of the input file', default = 1)
+@option('-b', '--block-size', type = int, help = 'number of characters which are read from the input file at once', default = BLOCK_SIZE)
+def normalize_labels(input_path: str, output_path: str, workers: int, block_size: int):
+    LabelNormalizer(workers, block_size).normalize(input_path, output_path)
 
 
 @main.command()
 @argument('input-path', type = str)
 @option('--output-path', '-o', type = str, default = 'assets/subgraph/answers.json')
-def query(input_path: str, output_path: str):
+@option('--concurrency', '-n', type = int, help = 'How many queries to execute at the same time', default = 1)
+@option('--deadline', '-t', type = float, help = 'Max number of seconds to wait for results of one query', default = None)
+@option('--checkpoint-path', type = str, help = 'Path to the .jsonl file with already computed results (defaults to the output path with .jsonl extension)', default = None)
+def query(input_path: str, output_path: str, concurrency: int, deadline: float, checkpoint_path: str):
     engine = QueryEngine()
 
-    answers = []
-
     with open(input_path, mode = 'r', encoding = 'utf-8') as file:
         lines = [line for line in file.read().split('\n') if line]
 
-    for line in tqdm(lines, desc = 'Running queries'):
+    ids = []
+    queries = []
+
+    for line in lines:
         entry = eval(line)
 
         input_query = entry['llm_generated_query']
@@ -364,13 +476,72 @@ def query(input_path: str, output_path: str):
         ))
         # query = f'\n\n\n{input_query}'  # add missing prefices
 
-        results = engine.run(query, id_ := entry['id'])
+        ids.append(entry['id'])
+        queries.append(query)
+
+    if checkpoint_path is None:
+        checkpoint_path = f'{path.splitext(output_path)[0]}.jsonl'
+
+    with Checkpoint(checkpoint_path) as checkpoint, ThreadPoolExecutor(max_workers = concurrency) as executor:
+        futures = {
+            executor.submit(engine.run, query, id_, deadline = deadline): id_
+            for id_, query in zip(ids, queries)
+            if id_ not in checkpoint
+        }
+
+        if len(futures) < len(ids):
+            print(f'Skipping {len(ids) - len(futures)} queries which have already been executed')
+
+        for future in tqdm(as_completed(futures), total = len(futures), desc = 'Running queries'):
+            id_ = futures[future]
 
-        answers.append({'id': id_, 'answer': results})
+            try:
+                results = future.result()
+            except QueryError as e:  # permanent failures are saved with the error, so they are not repeated on the next run
+                print(f'Cannot execute query "{id_}": {e}')
+                checkpoint.add(id_, [], error = str(e))
+                continue
+
+            if results is not None:  # timed out and transiently failed queries are not saved, so they are retried on the next run
+                checkpoint.add(id_, results)
+
+        if (n_failed := sum(id_ in checkpoint.errors for id_ in ids)) > 0:
+            print(f'{n_failed} queries have failed permanently, their answers are empty')
+
+        answers = [
+            {'id': id_, 'answer': checkpoint.get(id_, [])}
+            for id_ in ids
+        ]
 
     with open(output_path, 'w', encoding = 'utf-8') as file:
         dump(answers, file, indent = 4)
 
+    for url, stats in engine.transport.stats.items():
+        print(f'{url}: {stats}')
+
+
+@main.command()
+@option('-g', '--graph-path', type = str, help = 'Path to the .nt file with graph against which queries are executed', default = FIXTURE_PATH)
+@option('-q', '--queries-path', type = str, help = 'Path to the pickled answers of the llm which are replayed instead of sending requests', default = ANSWERS_PATH)
+@option('-n', '--n-questions', type = int, help = 'Number of questions which are sampled from the answers', default = 100)
+@option('-r', '--repeat', type = int, help = 'How many times every measurement is repeated', default = 1)
+@option('-s', '--seed', type = int, help = 'Seed for sampling questions', default = 0)
+@option('-b', '--benchmark', 'benchmarks', type = Choice(BENCHMARKS), multiple = True, help = 'Which benchmarks to run (defaults to all of them)')
+@option('-o', '--output-path', type = str, help = 'Path to the output .json file with results (printed if not given)', default = None)
+def bench(graph_path: str, queries_path: str, n_questions: int, repeat: int, seed: int, benchmarks: tuple, output_path: str):
+    benchmark = Benchmark(graph_path, queries_path, n_questions, repeat, seed)
+
+    try:
+        results = benchmark.run(benchmarks or BENCHMARKS)
+    finally:
+        benchmark.close()
+
+    if output_path is None:
+        print(dumps(results, indent = 4))
+    else:
+        with open(output_path, 'w', encoding = 'utf-8') as file:
+            dump(results, file, indent = 4)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,103 @@
+from collections import Counter
+from os import path
+from pickle import load, dump
+
+import numpy as np
+
+
+def _grams(text: str, n: int):
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+class Index:
+    """
+    Character n-gram inverted index which allows to skip exact similarity computation for most of the items.
+
+    By the q-gram lemma, strings of length m and k at edit distance d share at least max(m, k) - n + 1 - d * n n-grams,
+    so the number of shared n-grams gives an upper bound on the similarity which can be achieved by each item
+    """
+
+    def __init__(self, utterances: [str], n: int = 3, checksum: str = None):
+        self.n = n
+        self.checksum = checksum
+        self.lengths = np.array([len(utterance) for utterance in utterances], dtype = np.int64)
+
+        postings = {}
+
+        for i, utterance in enumerate(utterances):
+            for gram, count in _grams(utterance, n).items():
+                if (posting := postings.get(gram)) is None:
+                    posting = postings[gram] = ([], [])
+
+                posting[0].append(i)
+                posting[1].append(count)
+
+        self.postings = {
+            gram: (np.array(ids, dtype = np.int64), np.array(counts, dtype = np.int64))
+            for gram, (ids, counts) in postings.items()
+        }
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def bounds(self, lhs: str):
+        """
+        Compute upper bound of similarity between lhs and every indexed utterance
+        """
+
+        n = self.n
+        length = len(lhs)
+        lengths = self.lengths
+
+        ids = []
+        counts = []
+
+        for gram, count in _grams(lhs, n).items():
+            if (posting := self.postings.get(gram)) is not None:
+                ids.append(posting[0])
+                counts.append(np.minimum(posting[1], count))
+
+        if ids:
+            shared = np.bincount(np.concatenate(ids), weights = np.concatenate(counts), minlength = len(lengths)).astype(np.int64)
+        else:
+            shared = np.zeros(len(lengths), dtype = np.int64)
+
+        max_lengths = np.maximum(lengths, length)
+        min_distances = np.maximum(np.abs(lengths - length), -((shared - max_lengths + n - 1) // n))  # ceil of (max_length - n + 1 - shared) / n
+
+        return np.where(max_lengths > 0, 1 - min_distances / np.maximum(max_lengths, 1), 1.0)
+
+    def candidates(self, lhs: str, threshold: float = None):
+        """
+        Return positions of indexed utterances along with their similarity upper bounds, most promising items go first
+        """
+
+        bounds = self.bounds(lhs)
+        order = np.lexsort((np.arange(len(bounds)), -bounds))
+
+        if threshold is not None:
+            order = order[bounds[order] >= threshold]
+
+        return zip(bounds[order].tolist(), order.tolist())
+
+    def dump(self, index_path: str):
+        with open(index_path, 'wb') as file:
+            dump(self, file)
+
+    @classmethod
+    def load(cls, index_path: str, utterances: callable, checksum: str, n: int = 3):
+        """
+        Load index from index_path if it was built for the data with the same checksum, otherwise build and save it again
+        """
+
+        if path.isfile(index_path):
+            with open(index_path, 'rb') as file:
+                index = load(file)
+
+            if index.checksum == checksum and index.n == n:
+                return index
+
+        index = cls(utterances(), n = n, checksum = checksum)
+        index.dump(index_path)
+
+        return index
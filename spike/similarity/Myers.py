@@ -0,0 +1,95 @@
+class Myers:
+    """
+    Bit-parallel levenshtein distance (Myers, 1999) with unit costs - equivalent to the distance computed by Matrix.
+
+    The pattern is compiled once into per-character bit masks, after which every column of the dynamic programming table
+    is processed with a handful of integer operations, so only a constant amount of memory is used per comparison
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.length = length = len(pattern)
+
+        masks = {}
+
+        for i, char in enumerate(pattern):
+            masks[char] = masks.get(char, 0) | (1 << i)
+
+        self.masks = masks
+        self.mask = (1 << length) - 1
+        self.last = 1 << (length - 1) if length > 0 else 0
+
+    def distance(self, text: str, max_distance: int = None):
+        """
+        Compute edit distance between the pattern and the given text.
+
+        If max_distance is provided, the computation stops as soon as the distance is guaranteed to exceed it, and None is returned
+        """
+
+        n_rows = self.length
+        n_cols = len(text)
+
+        if max_distance is not None and abs(n_rows - n_cols) > max_distance:
+            return None
+
+        if n_rows == 0:
+            return n_cols
+
+        masks = self.masks
+        mask = self.mask
+        last = self.last
+
+        positive = mask
+        negative = 0
+        score = n_rows
+
+        for j, char in enumerate(text):
+            equal = masks.get(char, 0)
+
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+
+            positive_horizontal = negative | ~(horizontal | positive)
+            negative_horizontal = positive & horizontal
+
+            if positive_horizontal & last:
+                score += 1
+            elif negative_horizontal & last:
+                score -= 1
+
+            # The value in the last row changes by at most one per column, which gives a lower bound on the final distance
+
+            if max_distance is not None and score - (n_cols - j - 1) > max_distance:
+                return None
+
+            positive_horizontal = (positive_horizontal << 1) | 1
+            negative_horizontal = negative_horizontal << 1
+
+            positive = (negative_horizontal | ~(vertical | positive_horizontal)) & mask
+            negative = positive_horizontal & vertical & mask
+
+        return score
+
+    def similarity(self, text: str, threshold: float = None):
+        """
+        Compute normalized similarity in the same way as Matrix.similarity.
+
+        If threshold is provided, None is returned for texts which are less similar to the pattern than required
+        """
+
+        length = max(self.length, len(text))
+
+        if length == 0:
+            return 1.0
+
+        if threshold is None:
+            return 1 - self.distance(text) / length
+
+        # Allow one extra edit to be robust against floating point rounding, the exact check is performed below
+
+        distance = self.distance(text, max_distance = max(int((1 - threshold) * length) + 1, 0))
+
+        if distance is None or (similarity := 1 - distance / length) < threshold:
+            return None
+
+        return similarity
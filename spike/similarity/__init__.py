@@ -1,8 +1,14 @@
-from .Matrix import Matrix
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappushpop
+from math import ceil
+from os import cpu_count
+
+from .Myers import Myers
+from .Index import Index
 
 
 def compare(lhs: str, rhs: str):
-    return Matrix(len(lhs), len(rhs)).fit(lhs, rhs).similarity
+    return Myers(lhs).similarity(rhs)
 
     # dst = (matrix := Matrix(len(lhs), len(rhs)).fit(lhs, rhs)).distance
 
@@ -11,20 +17,139 @@ def compare(lhs: str, rhs: str):
     # print(dst)
 
 
-def rank(lhs: str, rhs: [str], top_n: int = None, get_utterance: callable = lambda x: x, threshold: float = 0.5):
+def _rank(lhs: str, get_utterance: callable, n_items: int, top_n: int = None, threshold: float = 0.5, index: Index = None):
+    pattern = Myers(lhs)
+
+    if index is None:
+        candidates = ((None, i) for i in range(n_items))
+    else:
+        candidates = index.candidates(lhs, threshold)  # sorted by similarity upper bound, so the scan may stop early
+
     unsorted_entries = []
+    top_scores = []  # min-heap with the best top_n scores seen so far, the smallest of them is a lower bound for the remaining items
+
+    for bound, i in candidates:
+        if top_scores and len(top_scores) >= top_n:
+            if bound is not None and bound < top_scores[0]:
+                break
 
-    for item in rhs:
-        if score := compare(lhs, get_utterance(item)) >= threshold:
-            unsorted_entries.append((score, item))
+            item_threshold = max(threshold, top_scores[0])
+        else:
+            item_threshold = threshold
+
+        if (score := pattern.similarity(get_utterance(i), threshold = item_threshold)) is not None:
+            unsorted_entries.append((score, i))
+
+            if top_n is not None:
+                if len(top_scores) < top_n:
+                    heappush(top_scores, score)
+                else:
+                    heappushpop(top_scores, score)
 
     entries = sorted(
         unsorted_entries,
-        key = lambda a: a[0],
-        reverse = True
+        key = lambda a: (-a[0], a[1])
     )
 
     if top_n is None:
         return [item[1] for item in entries]
     else:
         return [item[1] for item in entries[:top_n]]
+
+
+def rank(lhs: str, rhs: [str], top_n: int = None, get_utterance: callable = lambda x: x, threshold: float = 0.5, index: Index = None):
+    return [
+        rhs[i]
+        for i in _rank(lhs, lambda i: get_utterance(rhs[i]), len(rhs), top_n, threshold, index)
+    ]
+
+
+_corpus = None  # state shared by all tasks executed in a worker process of rank_many
+
+
+def _init_worker(utterances: [str], top_n: int, threshold: float, index: Index):
+    global _corpus
+
+    _corpus = (utterances, top_n, threshold, index)
+
+
+def _ready():
+    return None
+
+
+def _rank_in_worker(lhs: str):
+    utterances, top_n, threshold, index = _corpus
+
+    return _rank(lhs, utterances.__getitem__, len(utterances), top_n, threshold, index)
+
+
+class RankPool:
+    """
+    Process pool for ranking items of one corpus against many strings.
+
+    Corpus utterances and the index are sent to each worker process only once, after that workers receive just the lhs strings.
+    Worker processes are started right away rather than on the first task, so the pool must be created before the caller starts any threads
+    """
+
+    def __init__(
+        self, rhs: [str], top_n: int = None, get_utterance: callable = lambda x: x, threshold: float = 0.5, index: Index = None, workers: int = None
+    ):
+        self.rhs = rhs
+        self.top_n = top_n
+        self.threshold = threshold
+        self.index = index
+
+        self.utterances = utterances = [get_utterance(item) for item in rhs]
+        self.workers = workers = (cpu_count() or 1) if workers is None else workers
+
+        self._executor = executor = None if workers < 2 else ProcessPoolExecutor(workers, initializer = _init_worker, initargs = (utterances, top_n, threshold, index))
+
+        if executor is not None:  # the executor forks processes lazily, which is unsafe once the caller has started threads
+            for future in [executor.submit(_ready) for _ in range(workers)]:
+                future.result()
+
+    def _rank(self, lhs: str):
+        return _rank(lhs, self.utterances.__getitem__, len(self.utterances), self.top_n, self.threshold, self.index)
+
+    def _items(self, positions: [int]):
+        return [self.rhs[i] for i in positions]
+
+    def rank(self, lhs: str):
+        if self._executor is None:
+            return self._items(self._rank(lhs))
+
+        return self._items(self._executor.submit(_rank_in_worker, lhs).result())
+
+    def rank_many(self, lhs: [str], chunk_size: int = None):
+        if self._executor is None:
+            return [self._items(self._rank(item)) for item in lhs]
+
+        if chunk_size is None:
+            chunk_size = max(1, ceil(len(lhs) / (self.workers * 4)))
+
+        return [self._items(positions) for positions in self._executor.map(_rank_in_worker, lhs, chunksize = chunk_size)]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def rank_many(
+    lhs: [str], rhs: [str], top_n: int = None, get_utterance: callable = lambda x: x, threshold: float = 0.5, index: Index = None,
+    workers: int = None, chunk_size: int = None
+):
+    """
+    Rank rhs items for each of the lhs strings in parallel, the result is the same as calling rank for every string one by one
+    """
+
+    if workers is None:
+        workers = cpu_count() or 1
+
+    with RankPool(rhs, top_n, get_utterance, threshold, index, workers = min(workers, len(lhs))) as pool:
+        return pool.rank_many(lhs, chunk_size)
@@ -1,2 +1,5 @@
-from .string import put_prefix, cut_prefix, drop_spaces
-from .file import read, read_json
+from .string import put_prefix, cut_prefix, drop_spaces, normalize_query
+from .file import read, read_json, checksum
+from .sparql import iter_bindings, BindingsNotFoundError
+from .term import encode_term, decode_term, SEPARATOR
+from .stats import summarize, PERCENTILES
@@ -1,4 +1,5 @@
 import json
+from hashlib import sha1
 
 
 def read(path: str):
@@ -9,3 +10,13 @@ def read(path: str):
 def read_json(path: str):
     with open(path, 'r', encoding = 'utf-8') as file:
         return json.load(file)
+
+
+def checksum(path: str, block_size: int = 1 << 20):
+    digest = sha1()
+
+    with open(path, 'rb') as file:
+        while block := file.read(block_size):
+            digest.update(block)
+
+    return digest.hexdigest()
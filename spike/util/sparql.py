@@ -0,0 +1,76 @@
+import re
+from codecs import getincrementaldecoder
+from json import JSONDecoder, JSONDecodeError
+
+
+BINDINGS = re.compile(r'"bindings"\s*:\s*\[')
+WHITESPACE = re.compile(r'[\s,]*')
+
+
+class BindingsNotFoundError(ValueError):
+    pass
+
+
+def iter_bindings(chunks, max_head_size: int = 1 << 20):
+    """
+    Incrementally parse body of a sparql json response and yield its bindings one by one, so that the whole body is never kept in memory
+    """
+
+    decoder = JSONDecoder()
+    text_decoder = getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+
+    buffer = ''
+    exhausted = False
+
+    def read():
+        nonlocal buffer, exhausted
+
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            exhausted = True
+            buffer += text_decoder.decode(b'', final = True)
+            return
+
+        buffer += text_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+    # 1. Skip everything preceding the list of bindings
+
+    while (match := BINDINGS.search(buffer)) is None:
+        if exhausted or len(buffer) > max_head_size:
+            raise BindingsNotFoundError(f'Cannot find bindings in response {buffer[:1024]}')
+
+        read()
+
+    position = match.end()
+
+    # 2. Decode bindings as soon as they are completely loaded
+
+    while True:
+        position = WHITESPACE.match(buffer, position).end()
+
+        if position >= len(buffer):
+            if exhausted:
+                raise BindingsNotFoundError('Response ended before the list of bindings was closed')
+
+            buffer = buffer[position:]
+            position = 0
+            read()
+            continue
+
+        if buffer[position] == ']':
+            return
+
+        try:
+            binding, position = decoder.raw_decode(buffer, position)
+        except JSONDecodeError:
+            if exhausted:
+                raise
+
+            buffer = buffer[position:]
+            position = 0
+            read()
+            continue
+
+        yield binding
@@ -0,0 +1,27 @@
+import numpy as np
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def summarize(durations: [float]):
+    """
+    Return count, total, mean, min, max and percentiles of durations in seconds
+    """
+
+    if len(durations) < 1:
+        return {'n': 0}
+
+    durations = np.asarray(durations, dtype = np.float64)
+
+    return {
+        'n': len(durations),
+        'total': float(durations.sum()),
+        'mean': float(durations.mean()),
+        'min': float(durations.min()),
+        'max': float(durations.max()),
+        **{
+            f'p{percentile}': float(value)
+            for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES))
+        }
+    }
@@ -30,3 +30,20 @@ def cut_prefix(uri: str, prefixes: dict[str, str], sep: str = '#'):
 
 def drop_spaces(text: str):
     return SPACE.sub('', text)
+
+
+QUERY_TOKEN = re.compile(r'''("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*'|<[^<>"{}|^`\\\s]*>)|((?:\s|#[^\n]*)+)''')
+
+
+def normalize_query(query: str):
+    """
+    Drop comments and collapse whitespace outside of string literals and iris, so that formatting doesn't affect query identity
+    """
+
+    def replace(match):
+        if (literal := match.group(1)) is not None:
+            return literal
+
+        return ' '
+
+    return QUERY_TOKEN.sub(replace, query).strip()
@@ -0,0 +1,39 @@
+from rdflib import URIRef, BNode, Literal
+
+
+SEPARATOR = '\x00'
+
+
+def encode_term(term, exact: bool = True):
+    """
+    Serialize rdflib term into a string which is unique for every term and is cheap to pass between processes.
+
+    Language tags are compared case-insensitively by rdflib, so literals start with the lowercased tag and end with the original one,
+    which is dropped if exact is not set
+    """
+
+    if isinstance(term, Literal):
+        language = term.language or ''
+        prefix = f'L{language.lower()}{SEPARATOR}{term.datatype or ""}{SEPARATOR}{term}{SEPARATOR}'
+
+        return f'{prefix}{language}' if exact else prefix
+
+    if isinstance(term, BNode):
+        return f'B{term}'
+
+    return f'U{term}'
+
+
+def decode_term(key: str):
+    kind = key[0]
+
+    if kind == 'L':
+        _, datatype, value = key[1:].split(SEPARATOR, maxsplit = 2)
+        value, language = value.rsplit(SEPARATOR, maxsplit = 1)
+
+        return Literal(value, lang = language or None, datatype = URIRef(datatype) if datatype else None)
+
+    if kind == 'B':
+        return BNode(key[1:])
+
+    return URIRef(key[1:])
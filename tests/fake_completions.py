@@ -0,0 +1,67 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps, loads
+from threading import Lock, Thread
+from time import monotonic
+
+
+class FakeCompletions:
+    """
+    Local chat completion endpoint which answers with scripted statuses, so that pacing and retries of the client can be checked offline.
+
+    Every response is a pair (status, headers), the last one is repeated when the script runs out, successful responses echo the prompt
+    """
+
+    def __init__(self, responses: list = ((200, {}), )):
+        self.responses = list(responses)
+        self.requests = []  # (monotonic time, prompt) for every received request
+
+        self._lock = Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = loads(self.rfile.read(int(self.headers['Content-Length'])))
+                status, headers = fake._next(body['messages'][-1]['content'])
+
+                payload = dumps(
+                    {
+                        'id': 'fake', 'object': 'chat.completion', 'model': body['model'],
+                        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': body['messages'][-1]['content']}, 'finish_reason': 'stop'}],
+                        'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}
+                    } if status == 200 else
+                    {'error': {'message': 'scripted error', 'type': 'fake', 'code': None, 'param': None}}
+                ).encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+
+                for key, value in headers.items():
+                    self.send_header(key, value)
+
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = Thread(target = self.server.serve_forever, daemon = True)
+
+    @property
+    def api_base(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+
+    def _next(self, prompt: str):
+        with self._lock:
+            self.requests.append((monotonic(), prompt))
+            return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
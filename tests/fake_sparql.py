@@ -0,0 +1,64 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Lock, Thread
+from time import monotonic
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeSparql:
+    """
+    Local sparql endpoint which answers with scripted statuses, so that retries of the transport and failures of queries can be checked offline.
+
+    Every response is a tuple (status, headers, body), the last one is repeated when the script runs out, body None means one binding of the query text
+    """
+
+    def __init__(self, responses: list = ((200, {}, None), )):
+        self.responses = list(responses)
+        self.requests = []  # (monotonic time, query) for every received request
+
+        self._lock = Lock()
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query).get('query', [''])[0]
+                status, headers, body = fake._next(query)
+
+                if body is None:
+                    body = dumps({'head': {'vars': ['query']}, 'results': {'bindings': [{'query': {'type': 'literal', 'value': query}}]}})
+
+                payload = body.encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/sparql-results+json')
+                self.send_header('Content-Length', str(len(payload)))
+
+                for key, value in headers.items():
+                    self.send_header(key, value)
+
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = Thread(target = self.server.serve_forever, daemon = True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/sparql'
+
+    def _next(self, query: str):
+        with self._lock:
+            self.requests.append((monotonic(), query))
+            return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,66 @@
+from time import monotonic
+
+import openai
+import pytest
+from openai.error import InvalidRequestError
+
+from spike.ChatClient import ChatClient, TokenBucket
+
+from .fake_completions import FakeCompletions
+
+
+openai.api_key = 'fake'
+
+
+def test_retries_after_rate_limit():
+    with FakeCompletions([(429, {'Retry-After': '0.5'}), (200, {})]) as fake:
+        client = ChatClient(api_base = fake.api_base, backoff = 0.01)
+
+        start = monotonic()
+
+        assert client.complete('hello') == 'hello'
+        assert len(fake.requests) == 2
+        assert fake.requests[1][0] - fake.requests[0][0] >= 0.5
+        assert monotonic() - start < 5
+
+
+def test_caps_retry_after():
+    with FakeCompletions([(429, {'Retry-After': '600'}), (200, {})]) as fake:
+        client = ChatClient(api_base = fake.api_base, max_backoff = 0.1)
+
+        start = monotonic()
+
+        assert client.complete('hello') == 'hello'
+        assert monotonic() - start < 5
+
+
+def test_gives_up_after_max_retries():
+    with FakeCompletions([(503, {})]) as fake:
+        client = ChatClient(api_base = fake.api_base, max_retries = 2, backoff = 0.01)
+
+        with pytest.raises(openai.error.OpenAIError):
+            client.complete('hello')
+
+        assert len(fake.requests) == 3
+
+
+def test_returns_reserved_tokens_on_failure():
+    with FakeCompletions([(400, {})]) as fake:
+        client = ChatClient(api_base = fake.api_base, tokens_per_minute = 1000)
+
+        with pytest.raises(InvalidRequestError):
+            client.complete('hello')
+
+        assert client.tokens.tokens == pytest.approx(client.tokens.capacity, abs = 1)
+
+
+def test_paces_requests():
+    with FakeCompletions() as fake:
+        client = ChatClient(api_base = fake.api_base, requests_per_minute = 600)
+        client.requests = TokenBucket(600, capacity = 1)  # no bursts, one request every 0.1 s
+
+        assert client.complete_many([str(i) for i in range(6)]) == [str(i) for i in range(6)]
+
+        times = sorted(time for time, _ in fake.requests)
+
+        assert times[-1] - times[0] >= 0.45
@@ -0,0 +1,57 @@
+from time import monotonic
+
+import pytest
+
+from spike.Checkpoint import Checkpoint
+from spike.QueryEngine import QueryEngine, QueryError
+from spike.Transport import Transport
+
+from .fake_sparql import FakeSparql
+
+
+def _engine(fake: FakeSparql, **kwargs):
+    engine = QueryEngine(Transport(**kwargs))
+    engine.root = fake.url
+
+    return engine
+
+
+def test_deadline_bounds_retries():
+    with FakeSparql([(503, {'Retry-After': '30'}, '')]) as fake:
+        engine = _engine(fake, max_backoff = 1)
+
+        start = monotonic()
+
+        assert engine.run('select *', 'foo', deadline = 1.5) is None
+        assert monotonic() - start < 2
+        assert len(fake.requests) == 2
+
+
+def test_rejected_query_is_a_permanent_failure():
+    with FakeSparql([(400, {}, 'syntax error')]) as fake:
+        with pytest.raises(QueryError, match = 'syntax error'):
+            _engine(fake).run('select', 'foo')
+
+
+def test_unparseable_response_is_a_permanent_failure():
+    with FakeSparql([(200, {}, '{"results": {"bindings": [{"x": ')]) as fake:
+        with pytest.raises(QueryError):
+            _engine(fake).run('select *', 'foo')
+
+
+def test_unavailable_endpoint_is_a_transient_failure():
+    with FakeSparql([(503, {}, '')]) as fake:
+        assert _engine(fake, max_retries = 1, backoff = 0.01).run('select *', 'foo') is None
+
+
+def test_checkpoint_keeps_errors(tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoint.jsonl')
+
+    with Checkpoint(checkpoint_path) as checkpoint:
+        checkpoint.add('foo', [], error = 'syntax error')
+        checkpoint.add('bar', ['baz'])
+
+    checkpoint = Checkpoint(checkpoint_path)
+
+    assert checkpoint.get('foo') == [] and checkpoint.get('bar') == ['baz']
+    assert checkpoint.errors == {'foo': 'syntax error'}
@@ -0,0 +1,79 @@
+from time import monotonic
+
+from spike.Transport import Transport
+from spike.QueryEngine import QueryEngine
+
+from .fake_sparql import FakeSparql
+
+
+def test_retries_retryable_statuses():
+    with FakeSparql([(503, {}, ''), (500, {}, ''), (200, {}, None)]) as fake:
+        transport = Transport(backoff = 0.01)
+
+        with transport.get(fake.url, {'query': 'foo'}) as response:
+            assert response.status_code == 200
+
+        assert len(fake.requests) == 3
+        assert transport.stats[fake.url].n_retries == 2
+
+
+def test_returns_last_response_after_max_retries():
+    with FakeSparql([(503, {}, '')]) as fake:
+        transport = Transport(max_retries = 2, backoff = 0.01)
+
+        with transport.get(fake.url) as response:
+            assert response.status_code == 503
+
+        assert len(fake.requests) == 3
+
+
+def test_doesnt_retry_client_errors():
+    with FakeSparql([(400, {}, '')]) as fake:
+        with Transport(backoff = 0.01).get(fake.url) as response:
+            assert response.status_code == 400
+
+        assert len(fake.requests) == 1
+
+
+def test_waits_retry_after():
+    with FakeSparql([(429, {'Retry-After': '0.5'}, ''), (200, {}, None)]) as fake:
+        with Transport(backoff = 0.01).get(fake.url):
+            pass
+
+        assert fake.requests[1][0] - fake.requests[0][0] >= 0.5
+
+
+def test_caps_retry_after():
+    with FakeSparql([(429, {'Retry-After': '600'}, ''), (200, {}, None)]) as fake:
+        start = monotonic()
+
+        with Transport(max_backoff = 0.1).get(fake.url):
+            pass
+
+        assert monotonic() - start < 5
+
+
+def test_backoff_grows_up_to_the_cap():
+    transport = Transport(backoff = 0.5, max_backoff = 3)
+
+    for attempt in range(8):
+        for _ in range(100):
+            assert 0 <= transport._delay(attempt) <= min(3, 0.5 * 2 ** attempt)
+
+
+def test_query_engine_doesnt_retry_gateway_timeouts():
+    with FakeSparql([(504, {}, ''), (200, {}, None)]) as fake:
+        engine = QueryEngine(Transport(backoff = 0.01))
+        engine.root = fake.url
+
+        assert engine.run('select *', 'foo') is None
+        assert len(fake.requests) == 1
+
+
+def test_query_engine_retries_unavailable_endpoint():
+    with FakeSparql([(503, {}, ''), (200, {}, None)]) as fake:
+        engine = QueryEngine(Transport(backoff = 0.01))
+        engine.root = fake.url
+
+        assert engine.run('select *', 'foo') == ['select *']
+        assert len(fake.requests) == 2